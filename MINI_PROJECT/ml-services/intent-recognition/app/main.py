@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 import os
 import time
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import List, Optional
 from loguru import logger
 from datetime import datetime
@@ -14,6 +15,7 @@ from app.utils import (
     check_emergency, get_context_aware_intent, store_intent,
     INTENT_KEYWORDS, RESPONSE_TYPES
 )
+from mentalbloom_common.metrics import MetricsMiddleware, render_metrics, stage
 
 # Configure logger
 logger.add(
@@ -39,6 +41,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage latency histograms and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 async def root():
     return {
@@ -48,7 +53,8 @@ async def root():
             "/recognize-intent",
             "/batch-recognize-intent",
             "/intents",
-            "/health"
+            "/health",
+            "/metrics"
         ]
     }
 
@@ -60,6 +66,11 @@ async def health_check():
         "version": "2.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage and per-endpoint latency histograms in Prometheus format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/intents", response_model=IntentModel)
 async def get_intents():
     """Get information about available intents"""
@@ -78,18 +89,23 @@ def analyze_intent(text_request: TextRequest):
     if not text_request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
 
-    is_emergency = check_emergency(text_request.text)
+    with stage("emergency"):
+        is_emergency = check_emergency(text_request.text)
 
-    entities = extract_entities(text_request.text)
+    with stage("spacy"):
+        entities = extract_entities(text_request.text)
 
-    primary_intent, ml_confidence = detect_intent_with_ml(text_request.text)
+    with stage("nb"):
+        primary_intent, ml_confidence = detect_intent_with_ml(text_request.text)
 
     # If ML confidence is low, try zero-shot classification
     zero_shot_scores = {}
     if ml_confidence < 0.5:
-        zero_shot_scores = detect_intent_with_zero_shot(text_request.text)
+        with stage("zero_shot"):
+            zero_shot_scores = detect_intent_with_zero_shot(text_request.text)
 
-    keyword_scores = detect_intent_with_keywords(text_request.text)
+    with stage("keywords"):
+        keyword_scores = detect_intent_with_keywords(text_request.text)
 
 
     all_intents = {}
@@ -120,24 +136,26 @@ def analyze_intent(text_request: TextRequest):
         confidence = 0.0
 
 
-    context_aware_intent = get_context_aware_intent(
-        text_request.text,
-        previous_messages=text_request.previous_messages,
-        user_id=text_request.user_id,
-        conversation_id=text_request.conversation_id
-    )
+    with stage("redis"):
+        context_aware_intent = get_context_aware_intent(
+            text_request.text,
+            previous_messages=text_request.previous_messages,
+            user_id=text_request.user_id,
+            conversation_id=text_request.conversation_id
+        )
 
 
     suggested_response_type = RESPONSE_TYPES.get(primary_intent, "general")
 
 
     if text_request.user_id or text_request.conversation_id:
-        store_intent(
-            text_request.text,
-            {"primary_intent": primary_intent, "confidence": confidence},
-            user_id=text_request.user_id,
-            conversation_id=text_request.conversation_id
-        )
+        with stage("redis"):
+            store_intent(
+                text_request.text,
+                {"primary_intent": primary_intent, "confidence": confidence},
+                user_id=text_request.user_id,
+                conversation_id=text_request.conversation_id
+            )
 
  
     processing_time = (time.time() - start_time) * 1000  # in milliseconds
@@ -3,6 +3,7 @@ import nltk
 import os
 import time
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import List, Optional
 from loguru import logger
 from datetime import datetime
@@ -14,6 +15,7 @@ from app.utils import (
     get_transformer_sentiment, get_context_aware_sentiment,
     get_historical_sentiment, store_sentiment
 )
+from mentalbloom_common.metrics import MetricsMiddleware, render_metrics, stage
 
 
 logger.add(
@@ -45,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage latency histograms and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 async def root():
     return {
@@ -53,7 +58,8 @@ async def root():
         "endpoints": [
             "/analyze-sentiment",
             "/batch-analyze-sentiment",
-            "/health"
+            "/health",
+            "/metrics"
         ]
     }
 
@@ -65,6 +71,11 @@ async def health_check():
         "version": "2.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage and per-endpoint latency histograms in Prometheus format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 def analyze_text(text_request: TextRequest):
     """Core function to analyze text sentiment"""
     start_time = time.time()
@@ -73,14 +84,18 @@ def analyze_text(text_request: TextRequest):
     if not text_request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
 
-    vader_result = get_vader_sentiment(text_request.text)
+    with stage("vader"):
+        vader_result = get_vader_sentiment(text_request.text)
 
-    emotions = get_emotion_scores(text_request.text)
+    with stage("text2emotion"):
+        emotions = get_emotion_scores(text_request.text)
 
-    language = get_language(text_request.text)
+    with stage("langdetect"):
+        language = get_language(text_request.text)
 
     # Get transformer sentiment (if available)
-    transformer_result = get_transformer_sentiment(text_request.text)
+    with stage("transformer"):
+        transformer_result = get_transformer_sentiment(text_request.text)
     if transformer_result:
         if language == "en" and transformer_result["label"] in ["POSITIVE", "NEGATIVE"]:
             sentiment = transformer_result["label"].lower()
@@ -93,22 +108,23 @@ def analyze_text(text_request: TextRequest):
         sentiment = vader_result["sentiment"]
         compound = vader_result["compound"]
 
-    context_aware = get_context_aware_sentiment(
-        text_request.text,
-        user_id=text_request.user_id,
-        conversation_id=text_request.conversation_id
-    )
-
-    historical_trend = get_historical_sentiment(text_request.user_id) if text_request.user_id else None
-
-    if text_request.user_id or text_request.conversation_id:
-        store_sentiment(
+    with stage("redis"):
+        context_aware = get_context_aware_sentiment(
             text_request.text,
-            {"sentiment": sentiment, "compound": compound},
             user_id=text_request.user_id,
             conversation_id=text_request.conversation_id
         )
 
+        historical_trend = get_historical_sentiment(text_request.user_id) if text_request.user_id else None
+
+        if text_request.user_id or text_request.conversation_id:
+            store_sentiment(
+                text_request.text,
+                {"sentiment": sentiment, "compound": compound},
+                user_id=text_request.user_id,
+                conversation_id=text_request.conversation_id
+            )
+
     processing_time = (time.time() - start_time) * 1000  # in milliseconds
 
     return SentimentResponse(
@@ -0,0 +1,27 @@
+# Vector index backends
+from app.backends.base import VectorBackend
+from app.config import settings
+
+
+def create_backend(name: str, embedding) -> VectorBackend:
+    """Build the vector backend selected by name"""
+    if name == "pinecone":
+        # Imported lazily so local deployments do not need the Pinecone client
+        from app.backends.pinecone_backend import PineconeBackend
+        return PineconeBackend(embedding)
+
+    if name == "local" and settings.LOCAL_INDEX_PATH:
+        from app.backends.segments import SegmentedVectorBackend
+        return SegmentedVectorBackend(
+            embedding,
+            settings.EMBEDDING_DIMENSION,
+            directory=settings.LOCAL_INDEX_PATH,
+            dtype=settings.LOCAL_INDEX_DTYPE,
+            max_segments=settings.LOCAL_INDEX_MAX_SEGMENTS
+        )
+
+    if name == "local":
+        from app.backends.local import LocalVectorBackend
+        return LocalVectorBackend(embedding, settings.EMBEDDING_DIMENSION)
+
+    raise ValueError(f"Unknown vector backend: {name}")
@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+class VectorBackend(ABC):
+    """Interface implemented by every vector index backend"""
+
+    name: str = "base"
+
+    @abstractmethod
+    def add_documents(self, documents: List[Document], ids: List[str]) -> None:
+        """Embed and upsert documents under the given ids"""
+
+    @abstractmethod
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        """Upsert texts whose embeddings were already computed"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """Remove the given ids; ids that are not stored are ignored"""
+
+    @abstractmethod
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return (document, similarity) pairs, most similar first"""
+
+    @abstractmethod
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Like similarity_search_with_score, for an already-embedded query"""
+
+    def ping(self) -> None:
+        """Raise if the backend cannot serve requests; used by the health monitor"""
+
+    def close(self) -> None:
+        """Release any resources held by the backend"""
@@ -0,0 +1,207 @@
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.backends.base import VectorBackend
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so cosine similarity becomes a dot product"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the k highest scores, highest first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _posting_keys(key: str, value: Any) -> Iterable[Tuple[str, Any]]:
+    # List values (e.g. tags) match if any element matches, like Pinecone
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    for v in values:
+        try:
+            hash(v)
+        except TypeError:
+            continue
+        yield (key, v)
+
+
+class MetadataIndex:
+    """Inverted index from (metadata key, value) to row numbers for equality filters"""
+
+    def __init__(self):
+        self._postings: Dict[Tuple[str, Any], Set[int]] = defaultdict(set)
+
+    def add(self, row: int, metadata: Dict[str, Any]) -> None:
+        for key, value in metadata.items():
+            for posting in _posting_keys(key, value):
+                self._postings[posting].add(row)
+
+    def remove(self, row: int, metadata: Dict[str, Any]) -> None:
+        for key, value in metadata.items():
+            for posting in _posting_keys(key, value):
+                rows = self._postings.get(posting)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del self._postings[posting]
+
+    def match(self, filter: Dict[str, Any]) -> Set[int]:
+        """Rows matching every condition; supports plain values, $eq and $in"""
+        result: Optional[Set[int]] = None
+        for key, condition in filter.items():
+            if isinstance(condition, dict):
+                if set(condition) - {"$eq", "$in"}:
+                    raise ValueError(f"Unsupported filter operator for '{key}': {condition}")
+                wanted = list(condition.get("$in", []))
+                if "$eq" in condition:
+                    wanted.append(condition["$eq"])
+            else:
+                wanted = [condition]
+
+            rows: Set[int] = set()
+            for value in wanted:
+                rows |= self._postings.get((key, value), set())
+
+            result = rows if result is None else result & rows
+            if not result:
+                return set()
+        return result if result is not None else set()
+
+
+class LocalVectorBackend(VectorBackend):
+    """In-process cosine index over a contiguous float32 matrix"""
+
+    name = "local"
+
+    def __init__(self, embedding, dimension: int, initial_capacity: int = 1024):
+        self._embedding = embedding
+        self._dimension = dimension
+        self._lock = threading.RLock()
+
+        self._vectors = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._metadata_index = MetadataIndex()
+
+        logger.info(f"Local vector index initialized with {dimension} dimensions")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> None:
+        texts = [doc.page_content for doc in documents]
+        embeddings = self._embedding.embed_documents(texts)
+        self.add_embeddings(texts, embeddings, [doc.metadata for doc in documents], ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        """Upsert pre-computed embeddings; existing ids are overwritten in place"""
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self._dimension))
+
+        with self._lock:
+            self._reserve(self._size + len(ids))
+            for vector, text, metadata, doc_id in zip(vectors, texts, metadatas, ids):
+                metadata = dict(metadata or {})
+                row = self._id_to_row.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids.append(doc_id)
+                    self._texts.append(text)
+                    self._metadatas.append(metadata)
+                    self._id_to_row[doc_id] = row
+                else:
+                    self._metadata_index.remove(row, self._metadatas[row])
+                    self._texts[row] = text
+                    self._metadatas[row] = metadata
+                self._vectors[row] = vector
+                self._metadata_index.add(row, metadata)
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove ids; the last row moves into each freed row so the matrix stays contiguous"""
+        with self._lock:
+            for doc_id in ids:
+                row = self._id_to_row.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._metadata_index.remove(row, self._metadatas[row])
+                last = self._size - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._metadata_index.remove(last, self._metadatas[last])
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = moved_id
+                    self._texts[row] = self._texts[last]
+                    self._metadatas[row] = self._metadatas[last]
+                    self._id_to_row[moved_id] = row
+                    self._metadata_index.add(row, self._metadatas[row])
+                self._ids.pop()
+                self._texts.pop()
+                self._metadatas.pop()
+                self._size = last
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= self._vectors.shape[0]:
+            return
+        new_capacity = max(capacity, self._vectors.shape[0] * 2)
+        vectors = np.zeros((new_capacity, self._dimension), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search with an already-embedded query"""
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        with self._lock:
+            if filter:
+                rows = np.fromiter(self._metadata_index.match(filter), dtype=np.int64)
+                rows.sort()
+                scores = self._vectors[rows] @ query
+            else:
+                rows = None
+                scores = self._vectors[:self._size] @ query
+
+            results = []
+            for position in top_k(scores, k):
+                row = int(rows[position]) if rows is not None else int(position)
+                doc = Document(page_content=self._texts[row], metadata=dict(self._metadatas[row]))
+                results.append((doc, float(scores[position])))
+            return results
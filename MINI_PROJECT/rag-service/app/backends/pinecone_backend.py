@@ -0,0 +1,124 @@
+from pinecone import Pinecone as PineconeClient
+from langchain_pinecone import PineconeVectorStore
+from langchain_core.documents import Document
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from app.config import settings
+from app.backends.base import VectorBackend
+
+
+class PineconeBackend(VectorBackend):
+    """Vector backend backed by a pooled connection to a Pinecone index"""
+
+    name = "pinecone"
+
+    def __init__(self, embedding):
+        try:
+            pc = PineconeClient(
+                api_key=settings.PINECONE_API_KEY,
+                pool_threads=settings.PINECONE_POOL_THREADS
+            )
+
+            # The index is only checked once per connection instead of on every request
+            indexes = pc.list_indexes().names()
+            if settings.PINECONE_INDEX_NAME not in indexes:
+                logger.warning(f"Index {settings.PINECONE_INDEX_NAME} not found. Creating it...")
+                pc.create_index(
+                    name=settings.PINECONE_INDEX_NAME,
+                    dimension=settings.EMBEDDING_DIMENSION,
+                    metric="cosine"
+                )
+                logger.info(f"Successfully created Pinecone index: {settings.PINECONE_INDEX_NAME}")
+
+            # Resolve the data-plane host once so the index handle never has to look it up again
+            host = pc.describe_index(settings.PINECONE_INDEX_NAME).host
+            self.index = pc.Index(
+                host=host,
+                pool_threads=settings.PINECONE_POOL_THREADS,
+                connection_pool_maxsize=settings.PINECONE_CONNECTION_POOL_SIZE
+            )
+
+            self.vectorstore = PineconeVectorStore(
+                index=self.index,
+                embedding=embedding,
+                text_key="text",
+                namespace=settings.PINECONE_NAMESPACE
+            )
+            logger.info(f"Vector store initialized with namespace: {settings.PINECONE_NAMESPACE} (host: {host})")
+
+        except Exception as e:
+            logger.error(f"Error initializing Pinecone: {e}")
+
+            # Provide more helpful error messages for common issues
+            if "Failed to resolve" in str(e) and "pinecone.io" in str(e):
+                logger.error("DNS resolution error: Could not connect to Pinecone.")
+                logger.error(f"Check that your PINECONE_ENVIRONMENT value '{settings.PINECONE_ENVIRONMENT}' is correct.")
+                logger.error("The environment should be a valid Pinecone environment like 'gcp-starter', 'us-west1-gcp', etc.")
+                logger.error("Find your environment in the Pinecone console: https://app.pinecone.io/")
+            elif "Invalid API key" in str(e) or "Unauthorized" in str(e):
+                logger.error("Authentication error: Your Pinecone API key appears to be invalid.")
+                logger.error("Make sure you've set the correct PINECONE_API_KEY in your .env file.")
+            elif "No active indexes found" in str(e) or "Index not found" in str(e):
+                error_msg = "No active indexes found in your Pinecone project. "
+                error_msg += "Please check your Pinecone account and make sure you have permission to create indexes. "
+                error_msg += "You may need to upgrade your Pinecone plan if you've reached the index limit."
+                raise Exception(error_msg)
+            raise
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> None:
+        self.vectorstore.add_documents(documents, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        # Same record layout as PineconeVectorStore: the chunk text lives under the "text" key
+        vectors = [
+            (doc_id, embedding, {**(metadata or {}), "text": text})
+            for doc_id, embedding, metadata, text in zip(ids, embeddings, metadatas, texts)
+        ]
+        self.index.upsert(vectors=vectors, namespace=settings.PINECONE_NAMESPACE)
+
+    def delete(self, ids: List[str]) -> None:
+        if ids:
+            self.index.delete(ids=ids, namespace=settings.PINECONE_NAMESPACE)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        # Prepare filter dict for Pinecone if provided
+        filter_dict = None
+        if filter:
+            filter_dict = {f"metadata.{key}": value for key, value in filter.items()}
+
+        docs = self.vectorstore.similarity_search_by_vector_with_score(
+            embedding,
+            k=k,
+            filter=filter_dict
+        )
+
+        # Convert score to a similarity score (Pinecone returns distance)
+        return [(doc, 1 - score) for doc, score in docs]
+
+    def ping(self) -> None:
+        # One cheap data-plane call on the already-open index connection
+        self.index.describe_index_stats()
+
+    def close(self) -> None:
+        self.index.close()
@@ -0,0 +1,446 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.backends.base import VectorBackend
+from app.backends.local import MetadataIndex, normalize_rows, top_k
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+class Segment:
+    """One immutable, memory-mapped slab of vectors plus its sidecar metadata"""
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        deleted: Optional[List[bool]] = None
+    ):
+        self.name = name
+        self.vectors = vectors
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        # Tombstones record a deletion: they shadow older rows for their id but are never returned
+        self.deleted = np.array(deleted if deleted is not None else [False] * len(ids), dtype=bool)
+        # Rows shadowed by a newer row holding the same id are marked dead by the backend
+        self.alive = ~self.deleted
+        self.metadata_index = MetadataIndex()
+        for row, metadata in enumerate(metadatas):
+            self.metadata_index.add(row, metadata)
+
+    @staticmethod
+    def vectors_path(directory: str, name: str) -> str:
+        return os.path.join(directory, f"{name}.npy")
+
+    @staticmethod
+    def metadata_path(directory: str, name: str) -> str:
+        return os.path.join(directory, f"{name}.meta.jsonl")
+
+    @classmethod
+    def load(cls, directory: str, name: str) -> "Segment":
+        """Open a segment; vectors are mmapped so pages are shared through the OS page cache"""
+        vectors = np.load(cls.vectors_path(directory, name), mmap_mode="r")
+        ids, texts, metadatas, deleted = [], [], [], []
+        with open(cls.metadata_path(directory, name), "r") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+                deleted.append(record.get("deleted", False))
+        return cls(name, vectors, ids, texts, metadatas, deleted)
+
+    @classmethod
+    def write(
+        cls,
+        directory: str,
+        vectors: np.ndarray,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        deleted: Optional[List[bool]] = None
+    ) -> str:
+        """Write a new segment to disk and return its name"""
+        name = f"seg-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+        tmp_path = cls.vectors_path(directory, name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, cls.vectors_path(directory, name))
+
+        tmp_path = cls.metadata_path(directory, name) + ".tmp"
+        with open(tmp_path, "w") as f:
+            for row, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                record = {"id": doc_id, "text": text, "metadata": metadata}
+                if deleted is not None and deleted[row]:
+                    record["deleted"] = True
+                f.write(json.dumps(record, default=str) + "\n")
+        os.replace(tmp_path, cls.metadata_path(directory, name))
+
+        return name
+
+    @classmethod
+    def remove_files(cls, directory: str, name: str) -> None:
+        for path in (cls.vectors_path(directory, name), cls.metadata_path(directory, name)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class SegmentedVectorBackend(VectorBackend):
+    """Persistent local cosine index stored as append-only, memory-mapped segments
+
+    Every upsert appends a new segment and commits it by rewriting the
+    manifest; a delete appends a segment of tombstones. Once there are more than ``max_segments`` segments, a
+    background thread merges the run of ``merge_factor`` adjacent segments
+    with the fewest live rows, so large segments are rewritten rarely.
+    Other worker processes pick up changes by watching the manifest.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        embedding,
+        dimension: int,
+        directory: str,
+        dtype: str = "float32",
+        max_segments: int = 8,
+        merge_factor: int = 4
+    ):
+        self._embedding = embedding
+        self._dimension = dimension
+        self._directory = directory
+        self._dtype = np.dtype(dtype)
+        self._max_segments = max_segments
+        self._merge_factor = max(merge_factor, 2)
+
+        self._lock = threading.RLock()
+        self._segments: List[Segment] = []
+        self._positions: Dict[str, int] = {}  # segment name -> position in the manifest
+        self._latest: Dict[str, Tuple[Segment, int]] = {}  # id -> (segment, row) of its newest row
+        self._manifest_version: Optional[Tuple[int, int, int]] = None
+        self._merge_thread: Optional[threading.Thread] = None
+
+        os.makedirs(directory, exist_ok=True)
+        start_time = time.time()
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if manifest is None:
+                self._write_manifest([])
+            elif manifest["dimension"] != dimension:
+                raise ValueError(
+                    f"Local index at {directory} has dimension {manifest['dimension']}, expected {dimension}"
+                )
+            self._remove_orphans()
+            self._sync()
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(
+            f"Local vector index opened from {directory} in {processing_time:.2f}ms: "
+            f"{len(self)} vectors in {len(self._segments)} segments"
+        )
+
+    def __len__(self) -> int:
+        return sum(int(segment.alive.sum()) for segment in self._segments)
+
+    # Manifest handling
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes manifest updates and merges across worker processes
+        with open(os.path.join(self._directory, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self._directory, MANIFEST_FILE)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, segment_names: List[str]) -> None:
+        manifest = {
+            "version": 1,
+            "dimension": self._dimension,
+            "dtype": self._dtype.name,
+            "segments": segment_names
+        }
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _sync(self, attempts: int = 3) -> None:
+        """Reload the segment list from the manifest, reusing segments already open"""
+        with self._lock:
+            for attempt in range(attempts):
+                try:
+                    self._manifest_version = self._manifest_stamp()
+                    names = self._read_manifest()["segments"]
+                    loaded = {segment.name: segment for segment in self._segments}
+                    segments = [loaded.get(name) or Segment.load(self._directory, name) for name in names]
+                    break
+                except FileNotFoundError:
+                    # Another process merged the segments away after we read the manifest
+                    if attempt == attempts - 1:
+                        raise
+            self._apply_segments(segments)
+
+    def _manifest_stamp(self) -> Tuple[int, int, int]:
+        # The manifest is replaced atomically on every commit, so its inode changes too
+        stat = os.stat(self._manifest_path())
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _sync_if_changed(self) -> None:
+        try:
+            stamp = self._manifest_stamp()
+        except FileNotFoundError:
+            return
+        if stamp != self._manifest_version:
+            self._sync()
+
+    def _remove_orphans(self) -> None:
+        # Segment files the manifest does not reference were left by a crash before the
+        # manifest swap; writers only create them while holding the file lock, so none are in flight
+        referenced = set(self._read_manifest()["segments"])
+        for filename in os.listdir(self._directory):
+            if filename.startswith("seg-") and filename.split(".", 1)[0] not in referenced:
+                os.remove(os.path.join(self._directory, filename))
+                logger.warning(f"Removed orphaned vector segment file {filename}")
+            elif filename == MANIFEST_FILE + ".tmp":
+                os.remove(os.path.join(self._directory, filename))
+
+    def _apply_segments(self, segments: List[Segment]) -> None:
+        """Switch to a new segment list, updating shadowed rows for changed segments only"""
+        current = {segment.name for segment in segments}
+        previous = {segment.name for segment in self._segments}
+        removed = [segment for segment in self._segments if segment.name not in current]
+        added = [segment for segment in segments if segment.name not in previous]
+
+        self._segments = segments
+        self._positions = {segment.name: position for position, segment in enumerate(segments)}
+
+        for segment in removed:
+            for doc_id in segment.ids:
+                latest = self._latest.get(doc_id)
+                if latest is not None and latest[0] is segment:
+                    del self._latest[doc_id]
+
+        # The newest row for an id wins: later segments, and later rows within a segment
+        for segment in added:
+            position = self._positions[segment.name]
+            for row, doc_id in enumerate(segment.ids):
+                latest = self._latest.get(doc_id)
+                if latest is None or self._positions[latest[0].name] <= position:
+                    if latest is not None:
+                        latest[0].alive[latest[1]] = False
+                    self._latest[doc_id] = (segment, row)
+                else:
+                    segment.alive[row] = False
+
+    # Writes
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> None:
+        texts = [doc.page_content for doc in documents]
+        embeddings = self._embedding.embed_documents(texts)
+        self.add_embeddings(texts, embeddings, [doc.metadata for doc in documents], ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        """Append pre-computed embeddings as a new segment; newer ids shadow older ones"""
+        if not ids:
+            return
+
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self._dimension))
+        metadatas = [dict(metadata or {}) for metadata in metadatas]
+
+        with self._file_lock():
+            self._append_segment(vectors.astype(self._dtype), ids, texts, metadatas)
+
+        self._maybe_start_merge()
+
+    def delete(self, ids: List[str]) -> None:
+        """Append tombstones for the ids that currently have a live row"""
+        with self._file_lock():
+            self._sync()
+            with self._lock:
+                ids = [doc_id for doc_id in dict.fromkeys(ids) if self._is_live(doc_id)]
+            if not ids:
+                return
+            vectors = np.zeros((len(ids), self._dimension), dtype=self._dtype)
+            self._append_segment(vectors, ids, [""] * len(ids), [{} for _ in ids], [True] * len(ids))
+
+        self._maybe_start_merge()
+
+    def _append_segment(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        deleted: Optional[List[bool]] = None
+    ) -> None:
+        # Caller holds the file lock, so a file missing from the manifest is always a crash leftover
+        name = Segment.write(self._directory, vectors, ids, texts, metadatas, deleted)
+        names = self._read_manifest()["segments"]
+        self._write_manifest(names + [name])
+        self._sync()
+
+    def _is_live(self, doc_id: str) -> bool:
+        latest = self._latest.get(doc_id)
+        return latest is not None and bool(latest[0].alive[latest[1]])
+
+    # Background compaction
+
+    def _maybe_start_merge(self) -> None:
+        with self._lock:
+            if len(self._segments) <= self._max_segments:
+                return
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            self._merge_thread = threading.Thread(target=self.merge, name="vector-index-merge", daemon=True)
+            self._merge_thread.start()
+
+    def merge(self) -> None:
+        """Merge adjacent segments until there are at most ``max_segments`` of them"""
+        try:
+            while self._merge_once():
+                pass
+        except Exception as e:
+            logger.error(f"Error merging vector segments: {e}")
+
+    def _pick_merge(self, segments: List[Segment]) -> Tuple[int, int]:
+        # Merging adjacent segments keeps newer rows after older ones, which shadowing relies on
+        width = min(self._merge_factor, len(segments))
+        live = [int(segment.alive.sum()) for segment in segments]
+        start = min(range(len(segments) - width + 1), key=lambda i: sum(live[i:i + width]))
+        return start, start + width
+
+    def _merge_once(self) -> bool:
+        """Merge the run of adjacent segments with the fewest live rows; False if none is due"""
+        start_time = time.time()
+        with self._file_lock():
+            self._sync()
+            with self._lock:
+                segments = list(self._segments)
+            if len(segments) <= self._max_segments:
+                return False
+
+            start, end = self._pick_merge(segments)
+            vectors, ids, texts, metadatas, deleted = [], [], [], [], []
+            for segment in segments[start:end]:
+                keep = segment.alive.copy()
+                # Tombstones still hide rows in older segments; with no older segment they can go
+                if start > 0:
+                    for row in np.flatnonzero(segment.deleted):
+                        latest = self._latest.get(segment.ids[row])
+                        keep[row] = latest is not None and latest[0] is segment and latest[1] == row
+                rows = np.flatnonzero(keep)
+                vectors.append(np.asarray(segment.vectors[rows]))
+                ids.extend(segment.ids[row] for row in rows)
+                texts.extend(segment.texts[row] for row in rows)
+                metadatas.extend(segment.metadatas[row] for row in rows)
+                deleted.extend(bool(segment.deleted[row]) for row in rows)
+
+            merged = np.concatenate(vectors).astype(self._dtype)
+            name = Segment.write(self._directory, merged, ids, texts, metadatas, deleted)
+
+            names = [segment.name for segment in segments]
+            self._write_manifest(names[:start] + [name] + names[end:])
+            self._sync()
+
+        # Readers in other processes keep their mappings alive after unlink
+        for old_name in names[start:end]:
+            Segment.remove_files(self._directory, old_name)
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Merged {end - start} vector segments into {name} ({len(ids)} vectors) in {processing_time:.2f}ms")
+        return True
+
+    # Reads
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search with an already-embedded query"""
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        self._sync_if_changed()
+        with self._lock:
+            segments = list(self._segments)
+
+        candidates: List[Tuple[float, Segment, int]] = []
+        for segment in segments:
+            if filter:
+                # Gathering copies rows out of the mapping, which only pays off for the few rows a filter leaves
+                rows = np.fromiter(segment.metadata_index.match(filter), dtype=np.int64)
+                rows.sort()
+                rows = rows[segment.alive[rows]]
+                if rows.size == 0:
+                    continue
+                scores = segment.vectors[rows] @ query
+                for position in top_k(scores, k):
+                    candidates.append((float(scores[position]), segment, int(rows[position])))
+                continue
+
+            # Score the mapped array in place and mask out shadowed rows and tombstones
+            live = int(segment.alive.sum())
+            if live == 0:
+                continue
+            scores = np.where(segment.alive, segment.vectors @ query, -np.inf)
+            for row in top_k(scores, min(k, live)):
+                candidates.append((float(scores[row]), segment, int(row)))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [
+            (Document(page_content=segment.texts[row], metadata=dict(segment.metadatas[row])), score)
+            for score, segment, row in candidates[:k]
+        ]
+
+    def close(self) -> None:
+        if self._merge_thread is not None:
+            self._merge_thread.join()
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from loguru import logger
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models import DocumentIngestionRequest
+from app.executor import run_blocking
+from app.vectorstore import get_backend, get_embedding_model, prepare_document_chunks
+
+
+class _BulkDocument:
+    """Bookkeeping for one NDJSON line while its chunks are in flight"""
+
+    def __init__(self, line: int, document_id: str, title: str, chunk_count: int):
+        self.line = line
+        self.document_id = document_id
+        self.title = title
+        self.chunk_count = chunk_count
+        self.remaining = chunk_count
+        self.error: Optional[str] = None
+
+    def result(self) -> Dict[str, Any]:
+        result = {
+            "type": "document",
+            "line": self.line,
+            "document_id": self.document_id,
+            "title": self.title,
+            "chunk_count": self.chunk_count,
+            "status": "error" if self.error else "success"
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+async def _read_lines(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed request body into lines without buffering the whole body"""
+    buffer = b""
+    async for data in body:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def _queued_lines(lines: asyncio.Queue) -> AsyncIterator[bytes]:
+    while True:
+        line = await lines.get()
+        if line is None:
+            return
+        yield line
+
+
+class BulkIngestion:
+    """Chunks streamed documents, embeds chunks in fixed-size batches and upserts batches concurrently"""
+
+    def __init__(self, batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.batch_size = batch_size or settings.BULK_EMBED_BATCH_SIZE
+        self.backend = get_backend()
+        self.embedding = get_embedding_model()
+        self.results: asyncio.Queue = asyncio.Queue()
+        self._upsert_slots = asyncio.Semaphore(concurrency or settings.BULK_UPSERT_CONCURRENCY)
+        self._upserts = set()
+        self._pending: List[tuple] = []
+        self.documents = 0
+        self.failed = 0
+        self.chunks = 0
+
+    def _finish(self, doc: _BulkDocument, count: int, error: Optional[str] = None) -> None:
+        if error and not doc.error:
+            doc.error = error
+        doc.remaining -= count
+        if doc.remaining <= 0:
+            if doc.error:
+                self.failed += 1
+            self.results.put_nowait(doc.result())
+
+    async def run(self, lines: AsyncIterator[bytes]) -> None:
+        """Consume NDJSON lines; per-document results are put on ``results``, then None"""
+        try:
+            line_number = 0
+            async for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                self._add_line(line_number, line)
+                while len(self._pending) >= self.batch_size:
+                    await self._flush(self._pending[:self.batch_size])
+                    self._pending = self._pending[self.batch_size:]
+
+            if self._pending:
+                await self._flush(self._pending)
+                self._pending = []
+
+            if self._upserts:
+                await asyncio.gather(*self._upserts)
+        finally:
+            self.results.put_nowait(None)
+
+    def _add_line(self, line_number: int, line: bytes) -> None:
+        self.documents += 1
+        try:
+            document = json.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError(f"Expected a JSON object, got {type(document).__name__}")
+            request = DocumentIngestionRequest(**document)
+        except (ValueError, ValidationError) as e:
+            self.failed += 1
+            self.results.put_nowait({"type": "document", "line": line_number, "status": "error", "error": str(e)})
+            return
+
+        doc_id, chunks, ids = prepare_document_chunks(
+            title=request.title,
+            content=request.content,
+            url=request.url,
+            metadata=request.metadata
+        )
+        doc = _BulkDocument(line_number, doc_id, request.title, len(chunks))
+        if not chunks:
+            self._finish(doc, 0)
+            return
+
+        self.chunks += len(chunks)
+        self._pending.extend((doc, chunk, chunk_id) for chunk, chunk_id in zip(chunks, ids))
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        texts = [chunk.page_content for _, chunk, _ in batch]
+
+        try:
+            embeddings = await run_blocking(self.embedding.embed_documents, texts)
+        except Exception as e:
+            logger.error(f"Error embedding bulk batch: {e}")
+            self._finish_batch(batch, str(e))
+            return
+
+        # Bound the number of in-flight upserts; embedding of the next batch overlaps with them
+        await self._upsert_slots.acquire()
+        task = asyncio.create_task(self._upsert(batch, texts, embeddings))
+        self._upserts.add(task)
+        task.add_done_callback(self._upserts.discard)
+
+    async def _upsert(self, batch: List[tuple], texts: List[str], embeddings: List[List[float]]) -> None:
+        try:
+            await run_blocking(
+                self.backend.add_embeddings,
+                texts,
+                embeddings,
+                [chunk.metadata for _, chunk, _ in batch],
+                [chunk_id for _, _, chunk_id in batch]
+            )
+            self._finish_batch(batch)
+        except Exception as e:
+            logger.error(f"Error upserting bulk batch: {e}")
+            self._finish_batch(batch, str(e))
+        finally:
+            self._upsert_slots.release()
+
+    def _finish_batch(self, batch: List[tuple], error: Optional[str] = None) -> None:
+        counts: Dict[int, int] = {}
+        docs: Dict[int, _BulkDocument] = {}
+        for doc, _, _ in batch:
+            counts[id(doc)] = counts.get(id(doc), 0) + 1
+            docs[id(doc)] = doc
+        for key, doc in docs.items():
+            self._finish(doc, counts[key], error)
+
+
+async def _feed(lines: asyncio.Queue, line: Optional[bytes], producer: asyncio.Task) -> bool:
+    """Queue a line for ingestion, waiting while the queue is full; False if ingestion stopped"""
+    if not lines.full():
+        lines.put_nowait(line)
+        return True
+    put = asyncio.ensure_future(lines.put(line))
+    await asyncio.wait({put, producer}, return_when=asyncio.FIRST_COMPLETED)
+    if put.done():
+        return True
+    put.cancel()
+    return False
+
+
+async def start_bulk_ingest(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Ingest an NDJSON request body and return the stream of results
+
+    The body is read here, before the response starts, while ingestion runs alongside on
+    lines fed through a bounded queue. Under ASGI spec versions before 2.4, Starlette's
+    StreamingResponse listens for disconnects on the same receive channel and would swallow
+    body messages read from inside the response stream.
+    """
+    start_time = time.time()
+    ingestion = BulkIngestion()
+    lines: asyncio.Queue = asyncio.Queue(maxsize=ingestion.batch_size * 2)
+    producer = asyncio.create_task(ingestion.run(_queued_lines(lines)))
+
+    try:
+        async for line in _read_lines(body):
+            if not await _feed(lines, line, producer):
+                break
+        else:
+            await _feed(lines, None, producer)
+    except BaseException:
+        producer.cancel()
+        raise
+
+    return _stream_results(ingestion, producer, start_time)
+
+
+async def _stream_results(ingestion: BulkIngestion, producer: asyncio.Task, start_time: float) -> AsyncIterator[str]:
+    """Stream NDJSON results, one line per ingested document and a trailing summary"""
+    try:
+        while True:
+            result = await ingestion.results.get()
+            if result is None:
+                break
+            yield json.dumps(result) + "\n"
+
+        await producer
+    except Exception as e:
+        logger.error(f"Error during bulk ingestion: {e}")
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+    processing_time = (time.time() - start_time) * 1000  # in milliseconds
+    logger.info(
+        f"Bulk ingestion finished in {processing_time:.2f}ms: "
+        f"{ingestion.documents} documents, {ingestion.chunks} chunks, {ingestion.failed} failed"
+    )
+    yield json.dumps({
+        "type": "summary",
+        "documents": ingestion.documents,
+        "chunks": ingestion.chunks,
+        "failed": ingestion.failed,
+        "processing_time_ms": processing_time
+    }) + "\n"
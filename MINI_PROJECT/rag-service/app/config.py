@@ -16,41 +16,133 @@ class Settings:
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
 
+    # Simulated mode runs with no external services: local index, deterministic fake embeddings,
+    # a simulated LLM and canned sentiment/intent results. Each can still be overridden below.
+    SIMULATED_MODE: bool = os.getenv("SIMULATED_MODE", "false").lower() == "true"
+
+    # Vector Store Configuration ("pinecone" or "local")
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "local" if SIMULATED_MODE else "pinecone")
+
+    # Local index persistence; leave LOCAL_INDEX_PATH empty to keep the local index in memory
+    LOCAL_INDEX_PATH: str = os.getenv("LOCAL_INDEX_PATH", "")
+    LOCAL_INDEX_DTYPE: str = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # float32 or float16
+    LOCAL_INDEX_MAX_SEGMENTS: int = int(os.getenv("LOCAL_INDEX_MAX_SEGMENTS", 8))
+
     # Pinecone Configuration
     PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "mentallbloom")
     PINECONE_NAMESPACE: str = os.getenv("PINECONE_NAMESPACE", "mental-health-resources")
+    PINECONE_POOL_THREADS: int = int(os.getenv("PINECONE_POOL_THREADS", 4))
+    PINECONE_CONNECTION_POOL_SIZE: int = int(os.getenv("PINECONE_CONNECTION_POOL_SIZE", 10))
 
     # ML Services
     SENTIMENT_SERVICE_URL: str = os.getenv("SENTIMENT_SERVICE_URL", "http://sentiment-analysis:8000")
     INTENT_SERVICE_URL: str = os.getenv("INTENT_SERVICE_URL", "http://intent-recognition:8001")
+    SENTIMENT_SERVICE_TIMEOUT: float = float(os.getenv("SENTIMENT_SERVICE_TIMEOUT", 10.0))
+    INTENT_SERVICE_TIMEOUT: float = float(os.getenv("INTENT_SERVICE_TIMEOUT", 10.0))
+
+    # Shared HTTP client for the ML services
+    ML_HTTP_MAX_CONNECTIONS: int = int(os.getenv("ML_HTTP_MAX_CONNECTIONS", 100))
+    ML_HTTP_MAX_KEEPALIVE: int = int(os.getenv("ML_HTTP_MAX_KEEPALIVE", 20))
+    ML_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("ML_HTTP_KEEPALIVE_EXPIRY", 30.0))
+    ML_HTTP2: bool = os.getenv("ML_HTTP2", "true").lower() == "true"
+    ML_SERVICES_SIMULATED: bool = os.getenv("ML_SERVICES_SIMULATED", str(SIMULATED_MODE)).lower() == "true"
 
 
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
-    # LLM Configuration
+    # LLM Configuration ("gemini" or "simulated")
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "simulated" if SIMULATED_MODE else "gemini")
     GEMINI_MODEL: str = "models/gemini-1.5-flash-002"
     GEMINI_TEMPERATURE: float = 0.7
     GEMINI_TOP_P: float = 0.95
     GEMINI_TOP_K: int = 40
     GEMINI_MAX_OUTPUT_TOKENS: int = 1024
 
+    # Simulated LLM: lognormal time to first token, then a steady token rate
+    SIMULATED_LLM_LATENCY_MS: float = float(os.getenv("SIMULATED_LLM_LATENCY_MS", 400.0))  # mean time to first token
+    SIMULATED_LLM_LATENCY_SIGMA: float = float(os.getenv("SIMULATED_LLM_LATENCY_SIGMA", 0.5))  # 0 makes it constant
+    SIMULATED_LLM_TOKENS_PER_SECOND: float = float(os.getenv("SIMULATED_LLM_TOKENS_PER_SECOND", 50.0))
+    SIMULATED_LLM_RESPONSE_TOKENS: int = int(os.getenv("SIMULATED_LLM_RESPONSE_TOKENS", 150))
+    SIMULATED_LLM_SEED: int = int(os.getenv("SIMULATED_LLM_SEED", 0))
+
     # Embedding Configuration
     EMBEDDING_MODEL: str = "models/embedding-001"
     EMBEDDING_DIMENSION: int = 1024  #should match with pinecone dimension
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))  # in-memory LRU entries
+    EMBEDDING_CACHE_REDIS: bool = os.getenv("EMBEDDING_CACHE_REDIS", "false").lower() == "true"
+    EMBEDDING_CACHE_TTL: int = int(os.getenv("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))  # Redis tier, 1 week
+
+    # Threads for blocking vector store / embedding / LLM calls made from async code
+    BLOCKING_EXECUTOR_WORKERS: int = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", 16))
+
+    # Bulk Ingestion Configuration
+    BULK_EMBED_BATCH_SIZE: int = int(os.getenv("BULK_EMBED_BATCH_SIZE", 64))
+    BULK_UPSERT_CONCURRENCY: int = int(os.getenv("BULK_UPSERT_CONCURRENCY", 4))
+
+    # Ingestion Job Queue Configuration
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", 2))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", 1000))
+    INGEST_MAX_ATTEMPTS: int = int(os.getenv("INGEST_MAX_ATTEMPTS", 3))
+    INGEST_RETRY_BACKOFF: float = float(os.getenv("INGEST_RETRY_BACKOFF", 1.0))  # seconds, doubled per retry
+    INGEST_JOB_RETENTION: int = int(os.getenv("INGEST_JOB_RETENTION", 1000))
 
     # RAG Configuration
     MAX_DOCUMENTS: int = 5
-    SIMILARITY_THRESHOLD: float = 0.7
+    # Fake embeddings are unrelated to meaning, so simulated mode keeps every match
+    SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", -1.0 if SIMULATED_MODE else 0.7))
+
+    # Chat Stage Timeouts (seconds)
+    ANALYSIS_TIMEOUT: float = float(os.getenv("ANALYSIS_TIMEOUT", 5.0))
+    RETRIEVAL_TIMEOUT: float = float(os.getenv("RETRIEVAL_TIMEOUT", 5.0))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", 60.0))
+
+    # Emergency fast path: add a generated answer after the precomputed crisis response
+    EMERGENCY_FOLLOW_UP: bool = os.getenv("EMERGENCY_FOLLOW_UP", "true").lower() == "true"
+
+    # Prompt Token Budget (documents and history are trimmed to fit)
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", 3000))
+    PROMPT_DOCUMENT_SHARE: float = float(os.getenv("PROMPT_DOCUMENT_SHARE", 0.6))  # of the budget left after the input
+    PROMPT_MAX_DOCUMENT_TOKENS: int = int(os.getenv("PROMPT_MAX_DOCUMENT_TOKENS", 400))  # per retrieved chunk
+    TOKENIZER_ENCODING: str = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+    # Conversation Memory
+    CONVERSATION_STORE: str = os.getenv("CONVERSATION_STORE", "memory")  # "memory" or "redis"
+    CONVERSATION_RECENT_MESSAGES: int = int(os.getenv("CONVERSATION_RECENT_MESSAGES", 6))  # raw messages kept besides the summary
+    CONVERSATION_SUMMARY_WORDS: int = int(os.getenv("CONVERSATION_SUMMARY_WORDS", 150))
+    CONVERSATION_TTL: int = int(os.getenv("CONVERSATION_TTL", 7 * 24 * 3600))  # Redis expiry after the last turn
+    CONVERSATION_CACHE_SIZE: int = int(os.getenv("CONVERSATION_CACHE_SIZE", 10000))  # in-process LRU entries
 
     # Cache Configuration
-    CACHE_TTL: int = 3600  # 1 hour
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", 3600))  # 1 hour
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))  # cached chat answers, 0 disables
+    RESPONSE_CACHE_THRESHOLD: float = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.95))  # query cosine similarity for a hit
+
+    # Journal Store (MongoDB, with an in-process read-through cache of single entries)
+    JOURNAL_COLLECTION: str = os.getenv("JOURNAL_COLLECTION", "journal_entries")
+    JOURNAL_FACETS_COLLECTION: str = os.getenv("JOURNAL_FACETS_COLLECTION", "journal_facets")  # per-user tag/mood counts
+    JOURNAL_CACHE_SIZE: int = int(os.getenv("JOURNAL_CACHE_SIZE", 10000))  # cached entries, 0 disables
+    JOURNAL_CACHE_TTL: float = float(os.getenv("JOURNAL_CACHE_TTL", 60.0))  # bounds staleness across workers
+
+    # Journal Ingestion Outbox (retries use INGEST_MAX_ATTEMPTS / INGEST_RETRY_BACKOFF)
+    JOURNAL_OUTBOX_WORKERS: int = int(os.getenv("JOURNAL_OUTBOX_WORKERS", 1))
+    JOURNAL_OUTBOX_BATCH_SIZE: int = int(os.getenv("JOURNAL_OUTBOX_BATCH_SIZE", 16))  # entries claimed per batch
+    JOURNAL_OUTBOX_POLL_INTERVAL: float = float(os.getenv("JOURNAL_OUTBOX_POLL_INTERVAL", 2.0))  # seconds between idle polls
+    JOURNAL_OUTBOX_LEASE: float = float(os.getenv("JOURNAL_OUTBOX_LEASE", 60.0))  # seconds before a claimed entry can be reclaimed
+
+    # Journal Full-Text Search (per-user BM25 indexes in process)
+    JOURNAL_SEARCH_MAX_USERS: int = int(os.getenv("JOURNAL_SEARCH_MAX_USERS", 1000))  # indexes kept, LRU
+    JOURNAL_SEARCH_INDEX_TTL: float = float(os.getenv("JOURNAL_SEARCH_INDEX_TTL", 300.0))  # rebuild to pick up other workers' writes
+
+    # Dependency Health Checks (probed in the background; /health serves the latest results)
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv("HEALTH_CHECK_INTERVAL", 15.0))
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", 3.0))
 
     def validate(self) -> None:
         """Validate that all required settings are provided"""
-        if not self.GOOGLE_API_KEY:
+        if self.LLM_BACKEND == "gemini" and not self.GOOGLE_API_KEY:
             logger.warning("GOOGLE_API_KEY is not set. Gemini API will not work.")
 
-        if not self.PINECONE_API_KEY or not self.PINECONE_ENVIRONMENT:
+        if self.VECTOR_BACKEND == "pinecone" and (not self.PINECONE_API_KEY or not self.PINECONE_ENVIRONMENT):
             logger.warning("Pinecone credentials are not set. Vector store will not work.")
 
 settings = Settings()
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.models import Message, MessageRole
+
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and MentalBloom, a mental health support assistant.
+Update the summary with the new messages below. Keep what the user shared about their situation, feelings,
+goals and any advice already given. Write at most {max_words} words in the third person, with no preamble.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+class ConversationState:
+    """Rolling summary of older turns plus the most recent raw turns of one conversation"""
+
+    def __init__(self, conversation_id: str, summary: str = "", turns: Optional[List[Dict[str, str]]] = None):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.turns = turns or []
+
+    def history(self) -> List[Message]:
+        """The state as chat history: the summary as a system message, then the raw turns"""
+        messages = []
+        if self.summary:
+            messages.append(Message(
+                role=MessageRole.SYSTEM.value,
+                content=f"Summary of the earlier conversation: {self.summary}"
+            ))
+        messages.extend(Message(role=turn["role"], content=turn["content"]) for turn in self.turns)
+        return messages
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns})
+
+    @classmethod
+    def from_json(cls, conversation_id: str, data: str) -> "ConversationState":
+        payload = json.loads(data)
+        return cls(conversation_id, payload.get("summary", ""), payload.get("turns", []))
+
+
+class MemoryConversationBackend:
+    """In-process LRU of conversation states; states are stored serialized so callers never share objects"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, conversation_id: str) -> Optional[str]:
+        with self._lock:
+            data = self._data.get(conversation_id)
+            if data is not None:
+                self._data.move_to_end(conversation_id)
+            return data
+
+    async def set(self, conversation_id: str, data: str) -> None:
+        with self._lock:
+            self._data[conversation_id] = data
+            self._data.move_to_end(conversation_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisConversationBackend:
+    """Conversation states in Redis, shared by every worker, expiring after a period of inactivity"""
+
+    def __init__(self, client, ttl: int):
+        self.client = client
+        self.ttl = ttl
+
+    def _key(self, conversation_id: str) -> str:
+        # The sentiment service keeps its own "conversation:{id}" lists in the same Redis
+        return f"rag:conversation:{conversation_id}"
+
+    async def get(self, conversation_id: str) -> Optional[str]:
+        data = await self.client.get(self._key(conversation_id))
+        return data.decode("utf-8") if isinstance(data, bytes) else data
+
+    async def set(self, conversation_id: str, data: str) -> None:
+        await self.client.set(self._key(conversation_id), data, ex=self.ttl)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class ConversationStore:
+    """Server-side conversation memory keyed by conversation_id
+
+    After each response the new turns are appended; once more than ``max_turns`` messages are
+    kept, the oldest ones are folded into the summary by a background LLM call, so the history
+    sent to the model stays the same size however long the conversation runs.
+    """
+
+    def __init__(self, max_turns: int = settings.CONVERSATION_RECENT_MESSAGES, summary_words: int = settings.CONVERSATION_SUMMARY_WORDS):
+        self.max_turns = max_turns
+        self.summary_words = summary_words
+        self._backend = None
+        # Serializes updates per conversation; a lock disappears once no update holds it
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._tasks = set()
+
+    async def start(self) -> None:
+        if settings.CONVERSATION_STORE == "redis":
+            try:
+                import redis.asyncio as aioredis
+
+                client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+                await client.ping()
+                self._backend = RedisConversationBackend(client, settings.CONVERSATION_TTL)
+                logger.info(f"Conversation store connected to Redis at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+                return
+            except Exception as e:
+                logger.warning(f"Conversation store Redis unavailable, using in-process memory: {e}")
+        self._backend = MemoryConversationBackend(settings.CONVERSATION_CACHE_SIZE)
+        logger.info("Conversation store using in-process memory")
+
+    async def stop(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._backend is not None:
+            await self._backend.close()
+            self._backend = None
+
+    async def load(self, conversation_id: str) -> Optional[ConversationState]:
+        """Return the stored state, or None for unknown conversations (or if the store is down)"""
+        if self._backend is None:
+            return None
+        try:
+            data = await self._backend.get(conversation_id)
+        except Exception as e:
+            logger.error(f"Error loading conversation {conversation_id}: {e}")
+            return None
+        return ConversationState.from_json(conversation_id, data) if data else None
+
+    def record_turn(self, conversation_id: str, user_message: str, assistant_message: str, history: Optional[List[Message]] = None) -> None:
+        """Append a completed exchange in the background; ``history`` seeds conversations the store has not seen"""
+        if self._backend is None or not assistant_message:
+            return
+        task = asyncio.create_task(self._record_turn(conversation_id, user_message, assistant_message, history))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record_turn(self, conversation_id: str, user_message: str, assistant_message: str, history: Optional[List[Message]]) -> None:
+        start_time = time.time()
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = self._locks[conversation_id] = asyncio.Lock()
+        try:
+            async with lock:
+                state = await self.load(conversation_id)
+                if state is None:
+                    state = ConversationState(conversation_id, turns=[
+                        {"role": m.role, "content": m.content}
+                        for m in history or []
+                        if m.role in (MessageRole.USER, MessageRole.ASSISTANT)
+                    ])
+
+                state.turns.append({"role": MessageRole.USER.value, "content": user_message})
+                state.turns.append({"role": MessageRole.ASSISTANT.value, "content": assistant_message})
+                # Stored before summarizing, so a follow-up sent during the LLM call already sees it
+                await self._backend.set(conversation_id, state.to_json())
+
+                overflow = len(state.turns) - self.max_turns
+                if overflow > 0:
+                    try:
+                        state.summary = await self._summarize(state.summary, state.turns[:overflow])
+                        state.turns = state.turns[overflow:]
+                    except Exception as e:
+                        # Keep the raw turns and retry on the next exchange, within a hard cap
+                        logger.warning(f"Could not summarize conversation {conversation_id}: {e}")
+                        state.turns = state.turns[-2 * self.max_turns:]
+                    await self._backend.set(conversation_id, state.to_json())
+
+            processing_time = (time.time() - start_time) * 1000  # in milliseconds
+            logger.info(f"Updated conversation {conversation_id} in {processing_time:.2f}ms")
+        except Exception as e:
+            logger.error(f"Error updating conversation {conversation_id}: {e}")
+
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        from app.llm import get_llm
+
+        messages = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.summary_words,
+            summary=summary or "(none yet)",
+            messages=messages
+        )
+        response = await get_llm().ainvoke(prompt)
+        return response.content.strip()
+
+
+conversation_store = ConversationStore()
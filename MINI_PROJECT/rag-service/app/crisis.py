@@ -0,0 +1,62 @@
+import re
+from typing import Dict, Any
+
+# First person, optionally softened ("I really", "I've been"). Negations ("I don't",
+# "I'm not", "I would never") are deliberately not allowed between the subject and the
+# phrase, so "I don't want to die" or "I'm not suicidal" do not match.
+_SUBJECT = (
+    r"\bi(?:'m|m| am|'ve|ve| have|'ll| will|'d| would)?"
+    r"(?:\s+(?:really|just|honestly|seriously|actually|still|so|kind of|kinda|sometimes|often|keep|been|even))*\s+"
+)
+_ACTS = r"(?:kill myself|end my (?:own )?life|take my (?:own )?life|end it all|commit suicide|hurt myself|harm myself)"
+_ACTS_ING = (
+    r"(?:killing myself|ending my (?:own )?life|taking my (?:own )?life|ending it all|"
+    r"suicide|committing suicide|hurting myself|harming myself)"
+)
+
+# Anchored first-person statements of intent, like the intent service's EMERGENCY_PHRASES
+# but covering common variations, so they are caught before the HTTP call returns.
+# Mentions of the topic ("what are the signs of suicide?") are left to the intent service.
+CRISIS_PATTERNS = [
+    _SUBJECT + r"(?:want|wanna|wish|need)(?: to)? (?:die|be dead)\b",
+    _SUBJECT + r"(?:want|wanna|need|going|gonna|plan(?:ning)?|try(?:ing)?|tried|decided|ready|about)(?: to)? " + _ACTS + r"\b",
+    _SUBJECT + r"(?:think|thinking|thought|fantasi[sz]e|fantasi[sz]ing) (?:about|of) " + _ACTS_ING + r"\b",
+    _SUBJECT + r"(?:feel |feeling |felt )?suicidal\b",
+    _SUBJECT + r"(?:(?:have|had|made|got) )?a plan to " + _ACTS + r"\b",
+    _SUBJECT + r"(?:wrote|written) (?:a |my )?suicide note\b",
+    _SUBJECT + r"(?:self[- ]harm(?:ing)?|cutting myself)\b",
+    _SUBJECT + r"(?:do not|don't|dont) want to (?:live|be alive|be here|wake up)\b",
+    _SUBJECT + r"can(?:no|'|)t (?:take|do) (?:it|this) any ?more\b",
+    _SUBJECT + r"can(?:no|'|)t go on (?:like this|living|any ?more)\b",
+    r"\bno reason (?:for me )?to (?:live|go on|keep going)(?: any ?more)?\s*(?:[.!?,]|$)",
+    r"\b(?:everyone|everybody|people|they|my (?:family|friends|kids|parents)|the world) (?:would|will|'d)(?: all)? "
+    r"be better off (?:without me|if i (?:was|were) (?:gone|dead))\b"
+]
+
+_CRISIS_REGEX = re.compile("|".join(f"(?:{pattern})" for pattern in CRISIS_PATTERNS), re.IGNORECASE)
+
+# Precomputed so an emergency reply never waits on retrieval or the LLM
+CRISIS_RESPONSE = (
+    "I'm really sorry you're going through this, and I'm glad you told me. Your safety matters most right now.\n\n"
+    "Please reach out for immediate support:\n"
+    "- If you are in immediate danger, call your local emergency number (911 in the US, 112 in the EU, 999 in the UK).\n"
+    "- US: call or text 988 (Suicide & Crisis Lifeline), available 24/7.\n"
+    "- US/Canada: text HOME to 741741 to reach the Crisis Text Line.\n"
+    "- UK & Ireland: call Samaritans on 116 123.\n"
+    "- Elsewhere: find a local helpline at https://findahelpline.com.\n\n"
+    "If you can, let someone you trust know how you're feeling, and stay with them. "
+    "I'm here to keep talking with you."
+)
+
+# Intent result used when the local check fires before the intent service has answered
+LOCAL_CRISIS_INTENT: Dict[str, Any] = {
+    "primary_intent": "emergency",
+    "confidence": 1.0,
+    "is_emergency": True,
+    "suggested_response_type": "crisis_support"
+}
+
+
+def detect_crisis(text: str) -> bool:
+    """Sub-millisecond phrase check for crisis language"""
+    return _CRISIS_REGEX.search(text.replace("’", "'")) is not None
@@ -0,0 +1,156 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from app.config import settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies share a cache entry"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_cache_key(model_id: str, kind: str, text: str) -> str:
+    """Content hash of the normalized text, scoped to the model and embedding kind"""
+    payload = f"{model_id}\x00{kind}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU mapping keys to float32 vectors"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is not None:
+                self._data.move_to_end(key)
+            return vector
+
+    def set(self, key: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embedding model wrapper with an in-memory LRU tier and an optional Redis tier"""
+
+    def __init__(self, embedding: Embeddings, model_id: str, max_size: int, redis_client=None, ttl: Optional[int] = None):
+        self.embedding = embedding
+        self.model_id = model_id
+        self.memory = LRUCache(max_size)
+        self.redis = redis_client
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"embedding:{key}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                found[key] = vector
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.redis is not None:
+            try:
+                values = self.redis.mget([self._redis_key(key) for key in missing])
+                for key, value in zip(missing, values):
+                    if value is not None:
+                        vector = np.frombuffer(value, dtype=np.float32)
+                        self.memory.set(key, vector)
+                        found[key] = vector
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis lookup failed: {e}")
+
+        return found
+
+    def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        for key, vector in vectors.items():
+            self.memory.set(key, vector)
+
+        if vectors and self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, vector in vectors.items():
+                    pipe.set(self._redis_key(key), vector.tobytes(), ex=self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_cache_key(self.model_id, "document", text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        # Embed each distinct missing text once
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+
+        self.hits += len(texts) - len(pending)
+        self.misses += len(pending)
+
+        if pending:
+            embeddings = self.embedding.embed_documents(list(pending.values()))
+            computed = {
+                key: np.asarray(embedding, dtype=np.float32)
+                for key, embedding in zip(pending.keys(), embeddings)
+            }
+            self._store(computed)
+            found.update(computed)
+            logger.info(f"Embedding cache: {len(texts) - len(pending)}/{len(texts)} chunks served from cache")
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_cache_key(self.model_id, "query", text)
+        found = self._lookup([key])
+        if key in found:
+            self.hits += 1
+            return found[key].tolist()
+
+        self.misses += 1
+        vector = np.asarray(self.embedding.embed_query(text), dtype=np.float32)
+        self._store({key: vector})
+        return vector.tolist()
+
+
+def create_redis_client():
+    """Connect to the Redis embedding cache tier, or return None if it is disabled or unreachable"""
+    if not settings.EMBEDDING_CACHE_REDIS:
+        return None
+    try:
+        import redis
+
+        client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+        client.ping()
+        logger.info(f"Embedding cache Redis tier connected at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        return client
+    except Exception as e:
+        logger.warning(f"Embedding cache Redis tier unavailable, using memory only: {e}")
+        return None
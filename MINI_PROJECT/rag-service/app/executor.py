@@ -0,0 +1,23 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import settings
+
+# Dedicated, size-limited pool for calls that have no native async client
+blocking_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+    thread_name_prefix="rag-blocking"
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking call on the dedicated executor without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+
+def install_default_executor() -> None:
+    """Route libraries that fall back to loop.run_in_executor(None, ...) to the same pool"""
+    asyncio.get_running_loop().set_default_executor(blocking_executor)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.database import client as mongo_client
+from app.executor import run_blocking
+from app.llm import check_llm
+from app.ml_services import check_service
+from app.vectorstore import get_backend
+
+
+class DependencyStatus:
+    """Result of the latest probe of one dependency"""
+
+    def __init__(self, healthy: bool, latency_ms: Optional[float] = None, error: Optional[str] = None):
+        self.healthy = healthy
+        self.latency_ms = latency_ms
+        self.error = error
+        self.checked_at = datetime.now()
+
+
+class HealthMonitor:
+    """Probes dependencies on its own schedule and keeps the latest results for /health
+
+    Probes run concurrently every ``interval`` seconds, each bounded by ``timeout``, so the
+    cost to dependencies is fixed no matter how often /health is polled.
+    """
+
+    def __init__(self, interval: float = settings.HEALTH_CHECK_INTERVAL, timeout: float = settings.HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.statuses: Dict[str, DependencyStatus] = {}
+        self._probes: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+
+    @property
+    def core_dependencies(self):
+        """Dependencies that decide the overall status
+
+        The LLM is reported but left out: it is a shared external provider, and an outage
+        there should not take every replica out of rotation at once.
+        """
+        return (settings.VECTOR_BACKEND,)
+
+    def register(self, name: str, probe: Callable[[], Awaitable[None]]) -> None:
+        """Add a dependency; the probe raises when the dependency is unhealthy"""
+        self._probes[name] = probe
+        self.statuses.setdefault(name, DependencyStatus(False, error="not checked yet"))
+
+    async def start(self) -> None:
+        self._register_default_probes()
+        self._task = asyncio.create_task(self._run(), name="health-monitor")
+        logger.info(f"Health monitor started: {', '.join(self._probes)} every {self.interval}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*[self._check(name, probe) for name, probe in self._probes.items()])
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.interval)
+
+    async def _check(self, name: str, probe: Callable[[], Awaitable[None]]) -> None:
+        start_time = time.time()
+        try:
+            await asyncio.wait_for(probe(), timeout=self.timeout)
+            status = DependencyStatus(True, (time.time() - start_time) * 1000)  # in milliseconds
+        except asyncio.TimeoutError:
+            status = DependencyStatus(False, (time.time() - start_time) * 1000, f"timed out after {self.timeout}s")
+        except Exception as e:
+            status = DependencyStatus(False, (time.time() - start_time) * 1000, str(e))
+
+        previous = self.statuses.get(name)
+        if previous is not None and previous.healthy != status.healthy:
+            if status.healthy:
+                logger.info(f"Dependency '{name}' is healthy again")
+            else:
+                logger.warning(f"Dependency '{name}' is unhealthy: {status.error}")
+        self.statuses[name] = status
+
+    def _register_default_probes(self) -> None:
+        async def vector_backend() -> None:
+            await run_blocking(lambda: get_backend().ping())
+
+        async def llm() -> None:
+            check_llm()
+
+        async def mongo() -> None:
+            await mongo_client.admin.command("ping")
+
+        async def redis() -> None:
+            if self._redis is None:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            await self._redis.ping()
+
+        self.register(settings.LLM_BACKEND, llm)
+        self.register(settings.VECTOR_BACKEND, vector_backend)
+        self.register("sentiment_analysis", lambda: check_service(settings.SENTIMENT_SERVICE_URL, self.timeout))
+        self.register("intent_recognition", lambda: check_service(settings.INTENT_SERVICE_URL, self.timeout))
+        self.register("mongo", mongo)
+        # Redis is optional; only probe it when a Redis tier is configured
+        if settings.CONVERSATION_STORE == "redis" or settings.EMBEDDING_CACHE_REDIS:
+            self.register("redis", redis)
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,192 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import List, Dict, Any, Optional
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.config import settings
+from app.models import IngestionJobResponse
+from app.executor import run_blocking
+from app.vectorstore import get_backend, get_embedding_model, prepare_document_chunks
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IngestionJob:
+    """A single document ingestion with its progress counters"""
+
+    def __init__(self, title: str, url: Optional[str], metadata: Optional[Dict[str, Any]], content: str):
+        self.id = str(uuid.uuid4())
+        self.title = title
+        # Chunking is cheap, so it happens at submit time and fixes the document and chunk ids;
+        # retries then overwrite the same chunks instead of duplicating them
+        self.document_id, self.chunks, self.chunk_ids = prepare_document_chunks(title, content, url, metadata)
+        self.status = JobStatus.QUEUED
+        self.attempts = 0
+        self.chunks_embedded = 0
+        self.chunks_upserted = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+
+    def to_response(self) -> IngestionJobResponse:
+        return IngestionJobResponse(
+            job_id=self.id,
+            document_id=self.document_id,
+            title=self.title,
+            status=self.status.value,
+            attempts=self.attempts,
+            chunk_count=len(self.chunks),
+            chunks_embedded=self.chunks_embedded,
+            chunks_upserted=self.chunks_upserted,
+            error=self.error,
+            created_at=self.created_at,
+            updated_at=self.updated_at
+        )
+
+    def set_status(self, status: JobStatus, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.updated_at = datetime.now()
+
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion queue cannot accept more jobs"""
+
+
+class IngestionJobQueue:
+    """Bounded queue of ingestion jobs drained by a fixed pool of async workers"""
+
+    def __init__(
+        self,
+        workers: int = settings.INGEST_WORKERS,
+        max_queue_size: int = settings.INGEST_QUEUE_SIZE,
+        max_attempts: int = settings.INGEST_MAX_ATTEMPTS,
+        retry_backoff: float = settings.INGEST_RETRY_BACKOFF,
+        batch_size: int = settings.BULK_EMBED_BATCH_SIZE,
+        retention: int = settings.INGEST_JOB_RETENTION
+    ):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.retention = retention
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Ingestion job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, title: str, content: str, url: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> IngestionJob:
+        """Queue a document for ingestion and return its job immediately"""
+        if self._queue is None:
+            raise RuntimeError("Ingestion job queue is not running")
+
+        job = IngestionJob(title, url, metadata, content)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestionQueueFull(f"Ingestion queue is full ({self.max_queue_size} jobs)")
+
+        self._jobs[job.id] = job
+        self._evict_finished()
+        logger.info(f"Queued ingestion job {job.id}: {title} ({len(job.chunks)} chunks)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def _evict_finished(self) -> None:
+        # Forget the oldest finished jobs once more than `retention` are tracked
+        excess = len(self._jobs) - self.retention
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_with_retries(job)
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} crashed on job {job.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_with_retries(self, job: IngestionJob) -> None:
+        start_time = time.time()
+        while True:
+            job.attempts += 1
+            job.set_status(JobStatus.RUNNING)
+            try:
+                await self._process(job)
+                job.set_status(JobStatus.SUCCEEDED)
+                processing_time = (time.time() - start_time) * 1000  # in milliseconds
+                logger.info(f"Ingestion job {job.id} succeeded in {processing_time:.2f}ms: {job.title} ({len(job.chunks)} chunks)")
+                return
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    job.set_status(JobStatus.FAILED, str(e))
+                    logger.error(f"Ingestion job {job.id} failed after {job.attempts} attempts: {e}")
+                    return
+
+                delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                job.set_status(JobStatus.RETRYING, str(e))
+                logger.warning(f"Ingestion job {job.id} attempt {job.attempts} failed, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _process(self, job: IngestionJob) -> None:
+        backend = get_backend()
+        embedding = get_embedding_model()
+        job.chunks_embedded = 0
+        job.chunks_upserted = 0
+
+        for start in range(0, len(job.chunks), self.batch_size):
+            chunks: List[Document] = job.chunks[start:start + self.batch_size]
+            ids = job.chunk_ids[start:start + self.batch_size]
+            texts = [chunk.page_content for chunk in chunks]
+
+            # Embedding and upserting run off the event loop so /chat is never blocked
+            embeddings = await run_blocking(embedding.embed_documents, texts)
+            job.chunks_embedded += len(chunks)
+            job.updated_at = datetime.now()
+
+            await run_blocking(
+                backend.add_embeddings,
+                texts,
+                embeddings,
+                [chunk.metadata for chunk in chunks],
+                ids
+            )
+            job.chunks_upserted += len(chunks)
+            job.updated_at = datetime.now()
+
+
+ingestion_queue = IngestionJobQueue()
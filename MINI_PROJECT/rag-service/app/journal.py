@@ -6,85 +6,50 @@ from datetime import datetime
 
 from app.models import JournalEntry, JournalEntryResponse
 from app.config import settings
-from app.vectorstore import ingest_document, retrieve_relevant_documents
+from app.vectorstore import aretrieve_relevant_documents
+from app.journal_store import journal_repository, UPDATABLE_FIELDS, encode_cursor, decode_cursor
+from app.journal_search import journal_search_index, reciprocal_rank_fusion
+from app.journal_outbox import journal_outbox
+from mentalbloom_common.metrics import stage
 
-# In-memory storage for journal entries (in a production app, this would be a database)
-journal_entries = {}
+def _to_response(entry: Dict[str, Any]) -> JournalEntryResponse:
+    """Convert a stored entry to the API response"""
+    return JournalEntryResponse(
+        id=entry["id"],
+        user_id=entry["user_id"],
+        title=entry["title"],
+        content=entry["content"],
+        mood=entry.get("mood"),
+        tags=entry.get("tags") or [],
+        created_at=entry["created_at"],
+        updated_at=entry.get("updated_at"),
+        document_id=entry.get("document_id"),
+        ingested=entry.get("ingested", bool(entry.get("document_id")))
+    )
 
 async def create_journal_entry(entry: JournalEntry) -> JournalEntryResponse:
-    """Create a new journal entry and ingest it into the vector store"""
+    """Create a new journal entry and queue it for ingestion into the vector store
+
+    Returns as soon as the entry is stored; ``ingested`` turns true once the outbox
+    workers have embedded and upserted it.
+    """
     try:
         # Generate ID if not provided
         if not entry.id:
             entry.id = str(uuid.uuid4())
-        
-        # Set timestamps
-        entry.created_at = datetime.now()
+
+        # Set timestamps (MongoDB keeps milliseconds; truncating keeps cursors exact)
+        now = datetime.now()
+        entry.created_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
         entry.updated_at = entry.created_at
-        
-        # Store the entry
-        if entry.user_id not in journal_entries:
-            journal_entries[entry.user_id] = {}
-        
-        journal_entries[entry.user_id][entry.id] = entry.dict()
-        
-        # Ingest the entry into the vector store
-        document_id = None
-        ingested = False
-        
-        try:
-            # Format content for ingestion
-            formatted_content = f"Journal Entry - {entry.title}\n\nDate: {entry.created_at.strftime('%Y-%m-%d')}\n\n{entry.content}"
-            
-            # Add mood if available
-            if entry.mood:
-                formatted_content += f"\n\nMood: {entry.mood}"
-            
-            # Add tags if available
-            if entry.tags:
-                formatted_content += f"\n\nTags: {', '.join(entry.tags)}"
-            
-            # Create metadata
-            metadata = {
-                "type": "journal_entry",
-                "user_id": entry.user_id,
-                "entry_id": entry.id,
-                "created_at": entry.created_at.isoformat(),
-                "mood": entry.mood if entry.mood else "unknown"
-            }
-            
-            # Ingest the document
-            result = ingest_document(
-                title=f"Journal: {entry.title}",
-                content=formatted_content,
-                metadata=metadata
-            )
-            
-            document_id = result["document_id"]
-            ingested = True
-            
-            # Update the stored entry with document_id
-            journal_entries[entry.user_id][entry.id]["document_id"] = document_id
-            
-            logger.info(f"Journal entry ingested with document_id: {document_id}")
-        
-        except Exception as e:
-            logger.error(f"Error ingesting journal entry: {e}")
-            # Continue even if ingestion fails
-        
-        # Create response
-        return JournalEntryResponse(
-            id=entry.id,
-            title=entry.title,
-            content=entry.content,
-            mood=entry.mood,
-            tags=entry.tags,
-            created_at=entry.created_at,
-            updated_at=entry.updated_at,
-            document_id=document_id,
-            ingested=ingested
-        )
-    
+
+        # Store the entry; the same write queues it for ingestion
+        stored = await journal_repository.insert(entry.dict())
+        journal_search_index.index_entry(stored)
+        journal_outbox.notify()
+
+        return _to_response(stored)
+
     except Exception as e:
         logger.error(f"Error creating journal entry: {e}")
         raise
@@ -92,162 +57,93 @@ async def create_journal_entry(entry: JournalEntry) -> JournalEntryResponse:
 async def get_journal_entry(user_id: str, entry_id: str) -> Optional[JournalEntryResponse]:
     """Get a journal entry by ID"""
     try:
-        if user_id not in journal_entries or entry_id not in journal_entries[user_id]:
-            return None
-        
-        entry = journal_entries[user_id][entry_id]
-        
-        return JournalEntryResponse(
-            id=entry_id,
-            title=entry["title"],
-            content=entry["content"],
-            mood=entry.get("mood"),
-            tags=entry.get("tags", []),
-            created_at=entry["created_at"],
-            updated_at=entry.get("updated_at"),
-            document_id=entry.get("document_id"),
-            ingested=bool(entry.get("document_id"))
-        )
-    
+        entry = await journal_repository.get(user_id, entry_id)
+        return _to_response(entry) if entry else None
+
     except Exception as e:
         logger.error(f"Error getting journal entry: {e}")
         raise
 
 async def get_journal_entries(
-    user_id: str, 
-    page: int = 1, 
+    user_id: str,
+    page: int = 1,
     page_size: int = 10,
-    tag: Optional[str] = None,
-    mood: Optional[str] = None
+    tags: Optional[List[str]] = None,
+    moods: Optional[List[str]] = None,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
+    match_all_tags: bool = True,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
 ) -> Dict[str, Any]:
-    """Get journal entries for a user with pagination and filtering"""
+    """Get journal entries for a user with pagination and filtering
+
+    Pass the previous response's ``next_cursor`` as ``after`` to fetch the next page with a
+    range scan on the user's timeline index; ``page`` is only used without a cursor.
+    The total is counted on the first page only unless ``include_total`` is given, so
+    following cursors never pays for a count of the whole filtered set.
+    Several ``tags`` must all match unless ``match_all_tags`` is False; several ``moods``
+    match any.
+    """
+    # A malformed cursor is the caller's mistake (ValueError), not a storage error
+    position = decode_cursor(after) if after else None
+
     try:
-        if user_id not in journal_entries:
-            return {
-                "entries": [],
-                "total": 0,
-                "page": page,
-                "page_size": page_size
-            }
-        
-        # Get all entries for the user
-        all_entries = list(journal_entries[user_id].values())
-        
-        # Sort by created_at (newest first)
-        all_entries.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        # Filter by tag if provided
-        if tag:
-            all_entries = [e for e in all_entries if tag in e.get("tags", [])]
-        
-        # Filter by mood if provided
-        if mood:
-            all_entries = [e for e in all_entries if e.get("mood") == mood]
-        
-        # Calculate pagination
-        total = len(all_entries)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        
-        # Get entries for the current page
-        page_entries = all_entries[start_idx:end_idx]
-        
-        # Convert to response objects
-        entries = [
-            JournalEntryResponse(
-                id=e["id"],
-                title=e["title"],
-                content=e["content"],
-                mood=e.get("mood"),
-                tags=e.get("tags", []),
-                created_at=e["created_at"],
-                updated_at=e.get("updated_at"),
-                document_id=e.get("document_id"),
-                ingested=bool(e.get("document_id"))
-            )
-            for e in page_entries
-        ]
-        
+        # Newest first; filters and paging run in MongoDB on the (user_id, ...) indexes
+        entries, has_more, total = await journal_repository.list(
+            user_id,
+            limit=page_size,
+            after=position,
+            skip=0 if after else (max(page, 1) - 1) * page_size,
+            tags=tags,
+            match_all_tags=match_all_tags,
+            moods=moods,
+            start_date=start_date,
+            end_date=end_date,
+            count=include_total if include_total is not None else after is None
+        )
+
         return {
-            "entries": entries,
+            "entries": [_to_response(e) for e in entries],
             "total": total,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": encode_cursor(entries[-1]) if has_more else None,
+            "has_more": has_more
         }
-    
+
     except Exception as e:
         logger.error(f"Error getting journal entries: {e}")
         raise
 
+async def get_journal_facets(user_id: str) -> Dict[str, Any]:
+    """Get tag and mood counts for a user's journal"""
+    try:
+        facets = await journal_repository.facets(user_id)
+        return {"user_id": user_id, **facets}
+
+    except Exception as e:
+        logger.error(f"Error getting journal facets: {e}")
+        raise
+
 async def update_journal_entry(user_id: str, entry_id: str, updates: Dict[str, Any]) -> Optional[JournalEntryResponse]:
     """Update a journal entry"""
     try:
-        if user_id not in journal_entries or entry_id not in journal_entries[user_id]:
+        # Update fields and timestamp
+        changes = {key: value for key, value in updates.items() if key in UPDATABLE_FIELDS}
+        # Every updatable field is part of the ingested document, so any change queues a re-ingest
+        reingest = bool(changes)
+        changes["updated_at"] = datetime.now()
+
+        entry = await journal_repository.update(user_id, entry_id, changes, reingest=reingest)
+        if entry is None:
             return None
-        
-        # Get the current entry
-        entry = journal_entries[user_id][entry_id]
-        
-        # Update fields
-        for key, value in updates.items():
-            if key in ["title", "content", "mood", "tags"]:
-                entry[key] = value
-        
-        # Update timestamp
-        entry["updated_at"] = datetime.now()
-        
-        # Re-ingest if content or title changed
-        if "title" in updates or "content" in updates:
-            try:
-                # Format content for ingestion
-                formatted_content = f"Journal Entry - {entry['title']}\n\nDate: {entry['created_at'].strftime('%Y-%m-%d')}\n\n{entry['content']}"
-                
-                # Add mood if available
-                if entry.get("mood"):
-                    formatted_content += f"\n\nMood: {entry['mood']}"
-                
-                # Add tags if available
-                if entry.get("tags"):
-                    formatted_content += f"\n\nTags: {', '.join(entry['tags'])}"
-                
-                # Create metadata
-                metadata = {
-                    "type": "journal_entry",
-                    "user_id": user_id,
-                    "entry_id": entry_id,
-                    "created_at": entry["created_at"].isoformat(),
-                    "updated_at": entry["updated_at"].isoformat(),
-                    "mood": entry.get("mood", "unknown")
-                }
-                
-                # Ingest the document
-                result = ingest_document(
-                    title=f"Journal: {entry['title']}",
-                    content=formatted_content,
-                    metadata=metadata
-                )
-                
-                entry["document_id"] = result["document_id"]
-                
-                logger.info(f"Updated journal entry re-ingested with document_id: {entry['document_id']}")
-            
-            except Exception as e:
-                logger.error(f"Error re-ingesting updated journal entry: {e}")
-                # Continue even if ingestion fails
-        
-        # Return updated entry
-        return JournalEntryResponse(
-            id=entry_id,
-            title=entry["title"],
-            content=entry["content"],
-            mood=entry.get("mood"),
-            tags=entry.get("tags", []),
-            created_at=entry["created_at"],
-            updated_at=entry["updated_at"],
-            document_id=entry.get("document_id"),
-            ingested=bool(entry.get("document_id"))
-        )
-    
+        journal_search_index.index_entry(entry)
+        if reingest:
+            journal_outbox.notify()
+
+        return _to_response(entry)
+
     except Exception as e:
         logger.error(f"Error updating journal entry: {e}")
         raise
@@ -255,54 +151,58 @@ async def update_journal_entry(user_id: str, entry_id: str, updates: Dict[str, A
 async def delete_journal_entry(user_id: str, entry_id: str) -> bool:
     """Delete a journal entry"""
     try:
-        if user_id not in journal_entries or entry_id not in journal_entries[user_id]:
+        deleted = await journal_repository.delete(user_id, entry_id)
+        if deleted is None:
             return False
-        
-        # Delete the entry
-        del journal_entries[user_id][entry_id]
-        
-        # Note: We don't delete from the vector store as it would be complex
-        # In a production app, we would mark the document as deleted or implement a proper deletion mechanism
-        
+        journal_search_index.remove_entry(user_id, entry_id)
+
+        # The entry itself is already deleted; a vector store failure must not report otherwise
+        try:
+            await journal_outbox.delete_chunks(deleted)
+        except Exception as e:
+            logger.error(f"Error deleting chunks of journal entry {entry_id}: {e}")
         return True
-    
+
     except Exception as e:
         logger.error(f"Error deleting journal entry: {e}")
         raise
 
-async def search_journal_entries(user_id: str, query: str, limit: int = 5) -> List[JournalEntryResponse]:
-    """Search journal entries using the vector store"""
+async def search_journal_entries(user_id: str, query: str, limit: int = 5, semantic: bool = False) -> List[JournalEntryResponse]:
+    """Search journal entries by keyword, optionally fused with vector search
+
+    Keyword search runs on the user's in-process BM25 index. With ``semantic`` the vector
+    store is queried as well and both rankings are merged with reciprocal-rank fusion;
+    without it the vector store is only used when no entry contains the query words.
+    """
     try:
-        # Retrieve relevant documents
-        relevant_docs = retrieve_relevant_documents(
-            query=query,
-            k=limit,
-            filter={"user_id": user_id, "type": "journal_entry"}
-        )
-        
-        results = []
-        
-        for doc in relevant_docs:
-            # Extract entry_id from metadata
-            entry_id = doc.get("metadata", {}).get("entry_id")
-            
-            if entry_id and user_id in journal_entries and entry_id in journal_entries[user_id]:
-                entry = journal_entries[user_id][entry_id]
-                
-                results.append(JournalEntryResponse(
-                    id=entry_id,
-                    title=entry["title"],
-                    content=entry["content"],
-                    mood=entry.get("mood"),
-                    tags=entry.get("tags", []),
-                    created_at=entry["created_at"],
-                    updated_at=entry.get("updated_at"),
-                    document_id=entry.get("document_id"),
-                    ingested=True
-                ))
-        
-        return results
-    
+        # Fusion works best with a few more candidates from each side than we return
+        candidates = limit * 2 if semantic else limit
+
+        with stage("journal_keyword_search"):
+            lexical = [entry_id for entry_id, _ in await journal_search_index.search(user_id, query, candidates)]
+
+        if semantic or not lexical:
+            with stage("journal_vector_search"):
+                relevant_docs = await aretrieve_relevant_documents(
+                    query=query,
+                    k=candidates,
+                    filter={"user_id": user_id, "type": "journal_entry"}
+                )
+
+            # Extract entry ids from metadata, best match first (an entry may have several chunks)
+            vector = [doc.get("metadata", {}).get("entry_id") for doc in relevant_docs]
+            vector = [entry_id for entry_id in dict.fromkeys(vector) if entry_id]
+
+            entry_ids = reciprocal_rank_fusion([lexical, vector]) if semantic else vector
+        else:
+            entry_ids = lexical
+
+        # Load the entries in one query; hits for entries deleted since indexing drop out here
+        entry_ids = entry_ids[:limit]
+        entries = await journal_repository.get_many(user_id, entry_ids)
+
+        return [_to_response(entries[entry_id]) for entry_id in entry_ids if entry_id in entries]
+
     except Exception as e:
         logger.error(f"Error searching journal entries: {e}")
         raise
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from app.config import settings
+from app.executor import run_blocking
+from app.journal_store import journal_repository
+from app.vectorstore import get_backend, get_embedding_model, prepare_document_chunks
+
+
+def journal_document_id(entry_id: str) -> str:
+    """Fixed document id of an entry, so re-ingesting overwrites its chunks instead of adding more"""
+    return f"journal-{entry_id}"
+
+
+def journal_chunk_ids(entry_id: str, stop: int, start: int = 0) -> List[str]:
+    """Vector store ids of an entry's chunks ``start`` to ``stop - 1``"""
+    return [f"{journal_document_id(entry_id)}_{i}" for i in range(start, stop)]
+
+
+def journal_document(entry: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    """Return (title, content, metadata) of the vector store document for an entry"""
+    # Format content for ingestion
+    content = f"Journal Entry - {entry['title']}\n\nDate: {entry['created_at'].strftime('%Y-%m-%d')}\n\n{entry['content']}"
+
+    # Add mood if available
+    if entry.get("mood"):
+        content += f"\n\nMood: {entry['mood']}"
+
+    # Add tags if available
+    if entry.get("tags"):
+        content += f"\n\nTags: {', '.join(entry['tags'])}"
+
+    # Create metadata
+    metadata = {
+        "type": "journal_entry",
+        "user_id": entry["user_id"],
+        "entry_id": entry["id"],
+        "created_at": entry["created_at"].isoformat(),
+        "mood": entry.get("mood") or "unknown"
+    }
+    if entry.get("updated_at"):
+        metadata["updated_at"] = entry["updated_at"].isoformat()
+
+    return f"Journal: {entry['title']}", content, metadata
+
+
+class JournalOutbox:
+    """Background workers that drain pending journal ingestions from MongoDB
+
+    Every worker in every process claims up to ``batch_size`` due entries, embeds all of
+    their chunks in batched calls and upserts them under fixed chunk ids, then marks each
+    entry ingested. Failed entries are retried with exponential backoff up to
+    ``max_attempts`` times. Local writes wake the workers; otherwise they poll every
+    ``poll_interval`` seconds, which also picks up work queued by other processes.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.JOURNAL_OUTBOX_WORKERS,
+        batch_size: int = settings.JOURNAL_OUTBOX_BATCH_SIZE,
+        poll_interval: float = settings.JOURNAL_OUTBOX_POLL_INTERVAL,
+        lease: float = settings.JOURNAL_OUTBOX_LEASE,
+        max_attempts: int = settings.INGEST_MAX_ATTEMPTS,
+        retry_backoff: float = settings.INGEST_RETRY_BACKOFF,
+        embed_batch_size: int = settings.BULK_EMBED_BATCH_SIZE
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.embed_batch_size = embed_batch_size
+        self.ingested = 0
+        self.retried = 0
+        self.failed = 0
+        self.superseded = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"journal-outbox-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Journal outbox started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake the workers after an entry was queued for ingestion"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"ingested": self.ingested, "retried": self.retried, "failed": self.failed, "superseded": self.superseded}
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            # Cleared before draining, so a write queued during the drain still wakes us
+            self._wakeup.clear()
+            try:
+                if await self.drain_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Journal outbox worker {worker_id} error: {e}")
+
+            # Nothing due (or MongoDB is unavailable): wait for a local write or the next poll
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        """Claim and ingest one batch of due entries; returns how many were claimed"""
+        entries = []
+        while len(entries) < self.batch_size:
+            entry = await journal_repository.claim_pending_ingest(self.lease)
+            if entry is None:
+                break
+            entries.append(entry)
+        if not entries:
+            return 0
+
+        start_time = time.time()
+        try:
+            chunk_counts = await self._ingest(entries)
+        except Exception as e:
+            if len(entries) == 1:
+                await self._fail(entries[0], e)
+                return 1
+            # Retry one by one so a single bad entry does not hold back the rest
+            logger.warning(f"Journal outbox batch of {len(entries)} failed, retrying entries individually: {e}")
+            for entry in entries:
+                try:
+                    chunk_counts = await self._ingest([entry])
+                except Exception as entry_error:
+                    await self._fail(entry, entry_error)
+                    continue
+                await self._complete(entry, chunk_counts[entry["id"]])
+            return len(entries)
+
+        for entry in entries:
+            await self._complete(entry, chunk_counts[entry["id"]])
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Ingested {len(entries)} journal entries in {processing_time:.2f}ms")
+        return len(entries)
+
+    async def _ingest(self, entries: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Embed and upsert the entries' chunks; returns the chunk count per entry id"""
+        chunks: List[Document] = []
+        ids: List[str] = []
+        chunk_counts: Dict[str, int] = {}
+        for entry in entries:
+            title, content, metadata = journal_document(entry)
+            _, entry_chunks, entry_ids = prepare_document_chunks(
+                title,
+                content,
+                metadata=metadata,
+                document_id=journal_document_id(entry["id"])
+            )
+            chunks.extend(entry_chunks)
+            ids.extend(entry_ids)
+            chunk_counts[entry["id"]] = len(entry_chunks)
+            if len(entry_chunks) > entry.get("chunk_count", 0):
+                await journal_repository.reserve_chunks(entry, len(entry_chunks))
+
+        backend = get_backend()
+        embedding = get_embedding_model()
+        for start in range(0, len(chunks), self.embed_batch_size):
+            batch = chunks[start:start + self.embed_batch_size]
+            texts = [chunk.page_content for chunk in batch]
+
+            # Embedding and upserting run off the event loop so /chat is never blocked
+            embeddings = await run_blocking(embedding.embed_documents, texts)
+            await run_blocking(
+                backend.add_embeddings,
+                texts,
+                embeddings,
+                [chunk.metadata for chunk in batch],
+                ids[start:start + self.embed_batch_size]
+            )
+
+        # An edit that shortened an entry leaves chunks past its new count behind
+        stale = [
+            chunk_id
+            for entry in entries
+            for chunk_id in journal_chunk_ids(entry["id"], entry.get("chunk_count", 0), chunk_counts[entry["id"]])
+        ]
+        if stale:
+            await run_blocking(backend.delete, stale)
+        return chunk_counts
+
+    async def delete_chunks(self, entry: Dict[str, Any], chunk_count: Optional[int] = None) -> None:
+        """Remove a deleted entry's chunks from the vector store"""
+        if chunk_count is None:
+            chunk_count = entry.get("chunk_count", 0)
+        ids = journal_chunk_ids(entry["id"], chunk_count)
+        if ids:
+            await run_blocking(get_backend().delete, ids)
+
+    async def _complete(self, entry: Dict[str, Any], chunk_count: int) -> None:
+        if await journal_repository.complete_ingest(entry, journal_document_id(entry["id"]), chunk_count):
+            self.ingested += 1
+            return
+
+        self.superseded += 1
+        if await journal_repository.get(entry["user_id"], entry["id"]) is None:
+            # Deleted while we worked: the chunks just written would otherwise outlive it
+            logger.info(f"Journal entry {entry['id']} was deleted during ingestion; removing its chunks")
+            await self.delete_chunks(entry, max(chunk_count, entry.get("chunk_count", 0)))
+        else:
+            logger.info(f"Journal entry {entry['id']} changed during ingestion; it will be ingested again")
+
+    async def _fail(self, entry: Dict[str, Any], error: Exception) -> None:
+        attempts = entry.get("ingest_attempts", 0) + 1
+        if attempts >= self.max_attempts:
+            self.failed += 1
+            logger.error(f"Journal entry {entry['id']} ingestion failed after {attempts} attempts: {error}")
+            await journal_repository.fail_ingest(entry, str(error), None)
+            return
+
+        delay = self.retry_backoff * (2 ** (attempts - 1))
+        self.retried += 1
+        logger.warning(f"Journal entry {entry['id']} ingestion attempt {attempts} failed, retrying in {delay:.1f}s: {error}")
+        await journal_repository.fail_ingest(entry, str(error), datetime.now() + timedelta(seconds=delay))
+
+
+journal_outbox = JournalOutbox()
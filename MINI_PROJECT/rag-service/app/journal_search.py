@@ -0,0 +1,181 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, Counter
+from typing import List, Dict, Any, Tuple, Iterable
+
+from loguru import logger
+
+from app.config import settings
+from app.executor import run_blocking
+from app.journal_store import journal_repository
+from app.singleflight import SingleFlight
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Title and tag words say more about an entry than a word in its body
+TITLE_WEIGHT = 2
+TAG_WEIGHT = 2
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def entry_terms(entry: Dict[str, Any]) -> Counter:
+    """Term frequencies of an entry, with title and tag words weighted up"""
+    terms = Counter(tokenize(entry.get("content") or ""))
+    for term in tokenize(entry.get("title") or ""):
+        terms[term] += TITLE_WEIGHT
+    for tag in entry.get("tags") or []:
+        for term in tokenize(tag):
+            terms[term] += TAG_WEIGHT
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists by summed 1 / (k + rank); ids ranked well in several lists win"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: scores[item], reverse=True)
+
+
+class BM25Index:
+    """Inverted index over one user's entries, scored with Okapi BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> entry id -> term frequency
+        self._terms: Dict[str, List[str]] = {}  # entry id -> its terms, for removal
+        self._lengths: Dict[str, int] = {}  # entry id -> weighted term count
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, entry_id: str, terms: Counter) -> None:
+        self.remove(entry_id)
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[entry_id] = frequency
+        self._terms[entry_id] = list(terms)
+        length = sum(terms.values())
+        self._lengths[entry_id] = length
+        self._total_length += length
+
+    def remove(self, entry_id: str) -> None:
+        length = self._lengths.pop(entry_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._terms.pop(entry_id):
+            entries = self._postings[term]
+            del entries[entry_id]
+            if not entries:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Best ``limit`` (entry id, score) pairs for the query, highest score first"""
+        count = len(self._lengths)
+        if not count:
+            return []
+        average_length = self._total_length / count
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            entries = self._postings.get(term)
+            if not entries:
+                continue
+            idf = math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+            for entry_id, frequency in entries.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[entry_id] / average_length)
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class JournalSearchIndex:
+    """Per-user BM25 indexes kept in process, built from MongoDB on first search
+
+    Writes made through this process update a loaded index in place. An index is rebuilt
+    after ``ttl`` seconds so writes from other workers show up, and at most ``max_users``
+    indexes are kept (LRU).
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.hits = 0
+        self.builds = 0
+        self._indexes: "OrderedDict[str, Tuple[float, BM25Index]]" = OrderedDict()
+        self._writes = 0  # local writes, to spot a write landing during a build
+        self._flight = SingleFlight("journal_search_index")
+        self._lock = threading.Lock()
+
+    async def search(self, user_id: str, query: str, limit: int) -> List[Tuple[str, float]]:
+        index = await self._get_index(user_id)
+        return index.search(query, limit)
+
+    def index_entry(self, entry: Dict[str, Any]) -> None:
+        """Add or replace an entry in its user's index, if that index is loaded"""
+        with self._lock:
+            self._writes += 1
+            item = self._indexes.get(entry["user_id"])
+            if item is not None:
+                item[1].add(entry["id"], entry_terms(entry))
+
+    def remove_entry(self, user_id: str, entry_id: str) -> None:
+        with self._lock:
+            self._writes += 1
+            item = self._indexes.get(user_id)
+            if item is not None:
+                item[1].remove(entry_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"users": len(self._indexes), "max_users": self.max_users, "hits": self.hits, "builds": self.builds}
+
+    async def _get_index(self, user_id: str) -> BM25Index:
+        with self._lock:
+            item = self._indexes.get(user_id)
+            if item is not None and item[0] > time.time():
+                self._indexes.move_to_end(user_id)
+                self.hits += 1
+                return item[1]
+        # Concurrent searches for the same user share one build
+        return await self._flight.do(user_id, self._build, user_id)
+
+    async def _build(self, user_id: str) -> BM25Index:
+        start_time = time.time()
+        writes = self._writes
+
+        entries = await journal_repository.search_documents(user_id)
+        index = await run_blocking(self._index_entries, entries)
+
+        with self._lock:
+            self.builds += 1
+            # A local write landed mid-build and may be missing; serve this index once, rebuild next time
+            expires_at = time.time() + self.ttl if self._writes == writes else 0.0
+            self._indexes[user_id] = (expires_at, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Built journal search index for user {user_id} ({len(index)} entries) in {processing_time:.2f}ms")
+        return index
+
+    @staticmethod
+    def _index_entries(entries: List[Dict[str, Any]]) -> BM25Index:
+        index = BM25Index()
+        for entry in entries:
+            index.add(entry["id"], entry_terms(entry))
+        return index
+
+
+journal_search_index = JournalSearchIndex(
+    max_users=settings.JOURNAL_SEARCH_MAX_USERS,
+    ttl=settings.JOURNAL_SEARCH_INDEX_TTL
+)
@@ -0,0 +1,365 @@
+import base64
+import copy
+import threading
+import time
+from collections import OrderedDict, Counter
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from loguru import logger
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.database import client, MONGO_DB
+
+# Fields callers may change on an existing entry
+UPDATABLE_FIELDS = ("title", "content", "mood", "tags")
+
+# Timeline order: newest first, entry id breaks ties between equal timestamps
+TIMELINE_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+def encode_cursor(entry: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just after ``entry`` in the timeline"""
+    raw = f"{entry['created_at'].isoformat()},{entry['id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Return (created_at, entry_id) from a cursor; raises ValueError when it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, entry_id = raw.split(",", 1)
+        return datetime.fromisoformat(created_at), entry_id
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+class JournalRepository:
+    """Journal entries in MongoDB with an in-process read-through cache of single entries
+
+    Entries are stored with the entry id as ``_id``. Writes made through this process evict
+    the cached copy immediately; other workers may serve their cached copy for up to
+    ``cache_ttl`` seconds.
+
+    Per-user tag and mood counts live in ``facets_collection`` (one counter document per
+    user, kind and value) and are adjusted with $inc on every create, update and delete.
+
+    Each entry doubles as its own outbox record for vector store ingestion: the write that
+    creates or changes an entry also sets ``pending_ingest`` and bumps ``ingest_version``
+    in the same single-document update, so no change is committed without its ingestion
+    being queued. Workers claim pending entries with a lease and complete them only if
+    the version they ingested is still current.
+    """
+
+    def __init__(self, collection, facets_collection, cache_size: int, cache_ttl: float):
+        self.collection = collection
+        self.facets_collection = facets_collection
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._writes = 0  # bumped on every eviction so a read racing a write does not re-cache stale data
+        self._lock = threading.Lock()
+
+    async def ensure_indexes(self) -> None:
+        """Create the indexes the journal queries rely on (no-op when they exist)"""
+        # Each user's timeline, pre-sorted, so a page is a range scan of page_size keys
+        await self.collection.create_index([("user_id", ASCENDING)] + TIMELINE_SORT, name="user_timeline")
+        # Tag (multikey) and mood lookups, each also ordered by the timeline for filtered pages
+        await self.collection.create_index([("user_id", ASCENDING), ("tags", ASCENDING)] + TIMELINE_SORT, name="user_tag_timeline")
+        await self.collection.create_index([("user_id", ASCENDING), ("mood", ASCENDING)] + TIMELINE_SORT, name="user_mood_timeline")
+        # Pending ingestions in due order; only pending entries are indexed
+        await self.collection.create_index(
+            [("pending_ingest", ASCENDING), ("ingest_next_at", ASCENDING)],
+            name="ingest_outbox",
+            partialFilterExpression={"pending_ingest": True}
+        )
+        await self.facets_collection.create_index(
+            [("user_id", ASCENDING), ("kind", ASCENDING), ("value", ASCENDING)],
+            name="user_facet",
+            unique=True
+        )
+        logger.info(f"Journal indexes ready on {self.collection.name} and {self.facets_collection.name}")
+
+    async def insert(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new entry; ``entry["id"]`` becomes the document ``_id``"""
+        doc = {key: value for key, value in entry.items() if key != "id"}
+        doc["_id"] = entry["id"]
+        doc.update(self._queue_ingest_fields())
+        doc["ingest_version"] = 1
+        doc["ingested"] = False
+        await self.collection.insert_one(doc)
+        await self._count_facets(doc["user_id"], None, doc)
+        return self._from_doc(doc)
+
+    async def get(self, user_id: str, entry_id: str) -> Optional[Dict[str, Any]]:
+        key = (user_id, entry_id)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        writes = self._writes
+        doc = await self.collection.find_one({"_id": entry_id, "user_id": user_id})
+        if doc is None:
+            return None
+        entry = self._from_doc(doc)
+        self._cache_set(key, entry, writes)
+        return copy.deepcopy(entry)
+
+    async def get_many(self, user_id: str, entry_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several entries of one user at once, keyed by entry id; missing ids are left out"""
+        found = {}
+        missing = []
+        for entry_id in dict.fromkeys(entry_ids):
+            cached = self._cache_get((user_id, entry_id))
+            if cached is not None:
+                found[entry_id] = cached
+            else:
+                missing.append(entry_id)
+
+        if missing:
+            writes = self._writes
+            async for doc in self.collection.find({"_id": {"$in": missing}, "user_id": user_id}):
+                entry = self._from_doc(doc)
+                self._cache_set((user_id, entry["id"]), entry, writes)
+                found[entry["id"]] = copy.deepcopy(entry)
+        return found
+
+    async def list(
+        self,
+        user_id: str,
+        limit: int = 10,
+        after: Optional[Tuple[datetime, str]] = None,
+        skip: int = 0,
+        tags: Optional[List[str]] = None,
+        match_all_tags: bool = True,
+        moods: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        count: bool = True
+    ) -> Tuple[List[Dict[str, Any]], bool, Optional[int]]:
+        """A page of a user's entries, newest first
+
+        ``tags`` must all be present when ``match_all_tags`` is set, otherwise any of them;
+        ``moods`` match any; dates bound ``created_at`` inclusively. ``after`` is the
+        (created_at, id) of the last entry of the previous page; the page starts right after
+        it. Returns (entries, has_more, total matching the filters), with total None unless
+        ``count`` is set.
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if tags:
+            query["tags"] = {"$all" if match_all_tags else "$in": list(tags)}
+        if moods:
+            query["mood"] = {"$in": list(moods)}
+        if start_date or end_date:
+            query["created_at"] = {}
+            if start_date:
+                query["created_at"]["$gte"] = start_date
+            if end_date:
+                query["created_at"]["$lte"] = end_date
+
+        page_query = dict(query)
+        if after is not None:
+            created_at, entry_id = after
+            page_query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": entry_id}}
+            ]
+
+        # One extra entry tells us whether another page follows
+        cursor = self.collection.find(page_query).sort(TIMELINE_SORT).skip(skip).limit(limit + 1)
+        entries = [self._from_doc(doc) async for doc in cursor]
+        has_more = len(entries) > limit
+
+        total = await self.collection.count_documents(query) if count else None
+        return entries[:limit], has_more, total
+
+    async def search_documents(self, user_id: str) -> List[Dict[str, Any]]:
+        """Id, title, content and tags of every entry of a user, for the full-text index"""
+        cursor = self.collection.find({"user_id": user_id}, {"title": 1, "content": 1, "tags": 1, "user_id": 1})
+        return [self._from_doc(doc) async for doc in cursor]
+
+    async def facets(self, user_id: str) -> Dict[str, Dict[str, int]]:
+        """Entry counts per tag and per mood, read from the counters rather than the entries"""
+        result: Dict[str, Dict[str, int]] = {"tags": {}, "moods": {}}
+        async for doc in self.facets_collection.find({"user_id": user_id, "count": {"$gt": 0}}):
+            result["tags" if doc["kind"] == "tag" else "moods"][doc["value"]] = doc["count"]
+        return result
+
+    async def update(self, user_id: str, entry_id: str, changes: Dict[str, Any], reingest: bool = False) -> Optional[Dict[str, Any]]:
+        """Apply changes and return the updated entry, or None when it does not exist
+
+        With ``reingest`` the entry is queued for ingestion again in the same write.
+        """
+        update: Dict[str, Any] = {"$set": dict(changes)}
+        if reingest:
+            update["$set"].update(self._queue_ingest_fields())
+            update["$set"]["ingested"] = False
+            update["$inc"] = {"ingest_version": 1}
+
+        self._evict((user_id, entry_id))
+        before = await self.collection.find_one_and_update(
+            {"_id": entry_id, "user_id": user_id},
+            update,
+            return_document=ReturnDocument.BEFORE
+        )
+        self._evict((user_id, entry_id))
+        if before is None:
+            return None
+
+        after = {**before, **update["$set"]}
+        if reingest:
+            after["ingest_version"] = before.get("ingest_version", 0) + 1
+        if "tags" in changes or "mood" in changes:
+            await self._count_facets(user_id, before, after)
+        return self._from_doc(after)
+
+    async def delete(self, user_id: str, entry_id: str) -> Optional[Dict[str, Any]]:
+        """Delete an entry and return it as it was stored, or None when it does not exist"""
+        self._evict((user_id, entry_id))
+        doc = await self.collection.find_one_and_delete({"_id": entry_id, "user_id": user_id})
+        if doc is None:
+            return None
+        await self._count_facets(user_id, doc, None)
+        return self._from_doc(doc)
+
+    async def _count_facets(self, user_id: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """Move the tag and mood counters from the old version of an entry to the new one"""
+        deltas: Counter = Counter()
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            for tag in set(doc.get("tags") or []):
+                deltas[("tag", tag)] += sign
+            if doc.get("mood"):
+                deltas[("mood", doc["mood"])] += sign
+
+        operations = [
+            UpdateOne({"user_id": user_id, "kind": kind, "value": value}, {"$inc": {"count": delta}}, upsert=True)
+            for (kind, value), delta in deltas.items()
+            if delta
+        ]
+        if not operations:
+            return
+        try:
+            await self.facets_collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # The entry write already succeeded; the counters are only a summary of it
+            logger.error(f"Error updating journal facets for user {user_id}: {e}")
+
+    async def claim_pending_ingest(self, lease: float) -> Optional[Dict[str, Any]]:
+        """Lease the oldest due entry awaiting ingestion, or return None when there is none
+
+        A lease that runs out (e.g. the worker died) makes the entry claimable again.
+        """
+        now = datetime.now()
+        doc = await self.collection.find_one_and_update(
+            {
+                "pending_ingest": True,
+                "ingest_next_at": {"$lte": now},
+                "$or": [{"ingest_lease_until": None}, {"ingest_lease_until": {"$lt": now}}]
+            },
+            {"$set": {"ingest_lease_until": now + timedelta(seconds=lease)}},
+            sort=[("ingest_next_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        return self._from_doc(doc) if doc is not None else None
+
+    async def reserve_chunks(self, entry: Dict[str, Any], chunk_count: int) -> None:
+        """Raise the entry's stored chunk count before that many chunks are written
+
+        ``chunk_count`` is the highest number of chunks that may exist for the entry, so chunks
+        written by a pass that was later superseded or failed are still cleaned up.
+        """
+        await self.collection.update_one({"_id": entry["id"]}, {"$max": {"chunk_count": chunk_count}})
+
+    async def complete_ingest(self, entry: Dict[str, Any], document_id: str, chunk_count: int) -> bool:
+        """Mark a claimed entry ingested; False when it changed meanwhile and needs another pass"""
+        return await self._finish_ingest(entry, {
+            "pending_ingest": False,
+            "ingested": True,
+            "document_id": document_id,
+            "chunk_count": chunk_count,
+            "ingest_error": None
+        })
+
+    async def fail_ingest(self, entry: Dict[str, Any], error: str, retry_at: Optional[datetime]) -> bool:
+        """Record a failed attempt; retry at ``retry_at``, or give up when it is None"""
+        changes: Dict[str, Any] = {"ingest_attempts": entry.get("ingest_attempts", 0) + 1, "ingest_error": error}
+        if retry_at is None:
+            changes["pending_ingest"] = False
+        else:
+            changes["ingest_next_at"] = retry_at
+        return await self._finish_ingest(entry, changes)
+
+    async def _finish_ingest(self, entry: Dict[str, Any], changes: Dict[str, Any]) -> bool:
+        key = (entry["user_id"], entry["id"])
+        self._evict(key)
+        result = await self.collection.update_one(
+            {"_id": entry["id"], "ingest_version": entry["ingest_version"]},
+            {"$set": changes, "$unset": {"ingest_lease_until": ""}}
+        )
+        if result.matched_count == 0:
+            # Edited while we worked: drop the lease so the new version is picked up
+            await self.collection.update_one({"_id": entry["id"]}, {"$unset": {"ingest_lease_until": ""}})
+        self._evict(key)
+        return result.matched_count > 0
+
+    @staticmethod
+    def _queue_ingest_fields() -> Dict[str, Any]:
+        # The lease is left alone: a worker busy with an older version finishes first
+        return {"pending_ingest": True, "ingest_next_at": datetime.now(), "ingest_attempts": 0, "ingest_error": None}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    @staticmethod
+    def _from_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {key: value for key, value in doc.items() if key != "_id"}
+        entry["id"] = doc["_id"]
+        return entry
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None or item[0] <= time.time():
+                if item is not None:
+                    del self._cache[key]
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(item[1])
+
+    def _cache_set(self, key: Tuple[str, str], entry: Dict[str, Any], writes: int) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            if writes != self._writes:
+                return
+            self._cache[key] = (time.time() + self.cache_ttl, copy.deepcopy(entry))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _evict(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._writes += 1
+            self._cache.pop(key, None)
+
+
+journal_repository = JournalRepository(
+    client[MONGO_DB][settings.JOURNAL_COLLECTION],
+    client[MONGO_DB][settings.JOURNAL_FACETS_COLLECTION],
+    cache_size=settings.JOURNAL_CACHE_SIZE,
+    cache_ttl=settings.JOURNAL_CACHE_TTL
+)
@@ -2,13 +2,15 @@ import google.generativeai as genai
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import LLMChain
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from functools import lru_cache
 from loguru import logger
 import time
 
 from app.config import settings
 from app.models import Message, MessageRole
+from app.prompt_context import assemble_context
+from mentalbloom_common.metrics import stage
 
 # Configure Google Generative AI
 genai.configure(api_key=settings.GOOGLE_API_KEY)
@@ -16,7 +18,7 @@ genai.configure(api_key=settings.GOOGLE_API_KEY)
 def initialize_gemini_llm():
     """Initialize the Gemini LLM with the configured settings"""
     try:
-        model_name = "models/gemini-1.5-flash-002"
+        model_name = settings.GEMINI_MODEL
 
         llm = ChatGoogleGenerativeAI(
             model=model_name,
@@ -38,6 +40,48 @@ def initialize_gemini_llm():
         logger.error(f"Error initializing Gemini LLM: {e}")
         raise
 
+@lru_cache(maxsize=None)
+def get_llm():
+    """Build the configured chat model once per process; it is safe to share across requests"""
+    if settings.LLM_BACKEND == "simulated":
+        from app.simulation import create_simulated_llm
+
+        logger.info("Using the simulated LLM")
+        return create_simulated_llm()
+    if settings.LLM_BACKEND != "gemini":
+        raise ValueError(f"Unknown LLM backend '{settings.LLM_BACKEND}'; expected 'gemini' or 'simulated'")
+    return initialize_gemini_llm()
+
+class GenerationStatus:
+    """Outcome of the latest LLM generation in this process, reported by /health
+
+    The health monitor reads this instead of calling the provider, so health checks use no
+    quota and every replica reports what its own requests actually saw.
+    """
+
+    def __init__(self):
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def record_success(self) -> None:
+        self.last_success = time.time()
+
+    def record_failure(self, error: Exception) -> None:
+        self.last_failure = time.time()
+        self.last_error = str(error) or type(error).__name__
+
+    def check(self) -> None:
+        """Raise if the latest generation failed"""
+        if self.last_failure is not None and (self.last_success is None or self.last_failure > self.last_success):
+            raise RuntimeError(f"Latest generation failed: {self.last_error}")
+
+generation_status = GenerationStatus()
+
+def check_llm() -> None:
+    """Raise if the latest generation failed; the LLM provider is not contacted"""
+    generation_status.check()
+
 def convert_messages_to_langchain_format(messages: List[Message]):
     """Convert our message format to LangChain message format"""
     lc_messages = []
@@ -52,8 +96,33 @@ def convert_messages_to_langchain_format(messages: List[Message]):
 
     return lc_messages
 
-def create_rag_prompt_template(sentiment_info: Optional[Dict] = None, intent_info: Optional[Dict] = None):
-    """Create a prompt template for RAG that incorporates sentiment and intent information"""
+def prompt_key(sentiment_info: Optional[Dict] = None, intent_info: Optional[Dict] = None) -> Tuple:
+    """Reduce sentiment and intent results to the fields that shape the system prompt"""
+    sentiment = dominant_emotion = None
+    if sentiment_info:
+        sentiment = sentiment_info.get("sentiment", "neutral")
+        emotions = sentiment_info.get("emotions") or {}
+
+        # Find the dominant emotion
+        dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
+
+    intent = is_emergency = response_type = None
+    if intent_info:
+        intent = intent_info.get("primary_intent", "unknown")
+        is_emergency = bool(intent_info.get("is_emergency", False))
+        response_type = intent_info.get("suggested_response_type", "general")
+
+    return (sentiment, dominant_emotion, intent, is_emergency, response_type)
+
+@lru_cache(maxsize=256)
+def compile_rag_prompt_template(
+    sentiment: Optional[str],
+    dominant_emotion: Optional[str],
+    intent: Optional[str],
+    is_emergency: Optional[bool],
+    response_type: Optional[str]
+) -> ChatPromptTemplate:
+    """Build and parse the prompt template for one sentiment/intent combination"""
 
     # Base system prompt
     system_prompt = """You are MentalBloom, an empathetic and supportive mental health assistant.
@@ -70,13 +139,7 @@ Guidelines:
 - Acknowledge the user's feelings and validate their experiences
 """
 
-    if sentiment_info:
-        sentiment = sentiment_info.get("sentiment", "neutral")
-        emotions = sentiment_info.get("emotions", {})
-
-        # Find the dominant emotion
-        dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
-
+    if sentiment is not None:
         sentiment_prompt = f"""
 The user's message shows a {sentiment} sentiment with primarily {dominant_emotion} emotions.
 Adjust your response to be appropriately sensitive to their emotional state.
@@ -84,11 +147,7 @@ Adjust your response to be appropriately sensitive to their emotional state.
         system_prompt += sentiment_prompt
 
     # Add intent awareness if available
-    if intent_info:
-        intent = intent_info.get("primary_intent", "unknown")
-        is_emergency = intent_info.get("is_emergency", False)
-        response_type = intent_info.get("suggested_response_type", "general")
-
+    if intent is not None:
         intent_prompt = f"""
 The user's intent appears to be: {intent}
 """
@@ -109,13 +168,16 @@ Use a {response_type} response approach.
 
         system_prompt += intent_prompt
 
+    # Labels come from the ML services; escape braces so they are never read as variables
+    system_prompt = system_prompt.replace("{", "{{").replace("}", "}}")
+
     system_prompt += """
 Use the following retrieved documents to inform your response.
 Incorporate relevant information from these sources, but maintain a conversational tone.
 If the documents don't contain relevant information, rely on your general knowledge but be honest about limitations.
 
 Retrieved documents:
-{{retrieved_documents}}
+{retrieved_documents}
 
 Remember to be empathetic, accurate, and supportive in your response.
 """
@@ -128,7 +190,34 @@ Remember to be empathetic, accurate, and supportive in your response.
 
     return prompt_template
 
-def generate_response(
+def create_rag_prompt_template(sentiment_info: Optional[Dict] = None, intent_info: Optional[Dict] = None):
+    """Return the cached prompt template that matches the sentiment and intent information"""
+    return compile_rag_prompt_template(*prompt_key(sentiment_info, intent_info))
+
+def build_prompt_inputs(
+    user_input: str,
+    retrieved_documents: List[Dict],
+    chat_history: List[Message] = None
+) -> Dict[str, Any]:
+    """Fit the retrieved documents and chat history to the token budget as prompt variables"""
+    with stage("prompt_build"):
+        context = assemble_context(user_input, retrieved_documents, chat_history)
+        lc_history = convert_messages_to_langchain_format(context.chat_history) if context.chat_history else []
+
+    usage = context.usage
+    logger.info(
+        f"Prompt context uses {usage['total']}/{usage['budget']} tokens "
+        f"(input {usage['input']}, documents {usage['documents']}, history {usage['history']}); "
+        f"dropped {usage['documents_dropped']} documents and {usage['history_dropped']} history messages"
+    )
+
+    return {
+        "input": user_input,
+        "chat_history": lc_history,
+        "retrieved_documents": context.documents_text
+    }
+
+async def generate_response(
     llm,
     user_input: str,
     retrieved_documents: List[Dict],
@@ -140,24 +229,12 @@ def generate_response(
     start_time = time.time()
 
     try:
-        docs_text = ""
-        for i, doc in enumerate(retrieved_documents):
-            docs_text += f"[{i+1}] {doc.get('title', 'Untitled')}\n"
-            docs_text += f"Content: {doc.get('content', '')}\n\n"
-
         prompt = create_rag_prompt_template(sentiment_info, intent_info)
+        chain = prompt | llm
 
-
-        lc_history = convert_messages_to_langchain_format(chat_history) if chat_history else []
-
-        chain = LLMChain(llm=llm, prompt=prompt)
-
-        # Generate response from here 
-        response = chain.run(
-            input=user_input,
-            chat_history=lc_history,
-            retrieved_documents=docs_text
-        )
+        # Generate response with the model's native async client
+        message = await chain.ainvoke(build_prompt_inputs(user_input, retrieved_documents, chat_history))
+        response = message.content
 
         processing_time = (time.time() - start_time) * 1000  # in milliseconds
         logger.info(f"Generated response in {processing_time:.2f}ms")
@@ -166,3 +243,32 @@ def generate_response(
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         raise
+
+async def stream_response(
+    llm,
+    user_input: str,
+    retrieved_documents: List[Dict],
+    chat_history: List[Message] = None,
+    sentiment_info: Optional[Dict] = None,
+    intent_info: Optional[Dict] = None
+) -> AsyncIterator[str]:
+    """Yield response text chunks as the LLM produces them"""
+    start_time = time.time()
+    first_token_time = None
+
+    try:
+        prompt = create_rag_prompt_template(sentiment_info, intent_info)
+        chain = prompt | llm
+
+        async for chunk in chain.astream(build_prompt_inputs(user_input, retrieved_documents, chat_history)):
+            if not chunk.content:
+                continue
+            if first_token_time is None:
+                first_token_time = (time.time() - start_time) * 1000  # in milliseconds
+            yield chunk.content
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Streamed response in {processing_time:.2f}ms (first token after {first_token_time or 0:.2f}ms)")
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+        raise
@@ -1,22 +1,40 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal
 from loguru import logger
 import time
+import json
 from datetime import datetime
 import os
 
 from app.config import settings
 from app.models import (
     ChatRequest, ChatResponse,
-    DocumentIngestionRequest, DocumentIngestionResponse,
-    HealthResponse, JournalEntry, JournalEntryResponse, JournalEntryListResponse
+    DocumentIngestionRequest, DocumentIngestionResponse, IngestionJobResponse,
+    HealthResponse, JournalEntry, JournalEntryResponse, JournalEntryListResponse, JournalFacetsResponse
 )
 from app.routers import emotions
-from app.rag_pipeline import process_chat_request
-from app.vectorstore import ingest_document, initialize_pinecone
-from app.llm import initialize_gemini_llm
-from app.journal import create_journal_entry, get_journal_entry, get_journal_entries, update_journal_entry, delete_journal_entry, search_journal_entries
+from app.rag_pipeline import process_chat_request, stream_chat_request
+from app.vectorstore import vectorstore_manager
+from app.bulk_ingest import start_bulk_ingest
+from app.ingestion_jobs import ingestion_queue, IngestionQueueFull
+from app.conversations import conversation_store
+from app.executor import install_default_executor, blocking_executor
+from app.ml_services import start_http_client, close_http_client, get_connection_stats
+from app.llm import get_llm
+from app.response_cache import response_cache
+from app.singleflight import get_singleflight_stats
+from app.health import health_monitor
+from mentalbloom_common.metrics import MetricsMiddleware, render_metrics, stage, record_stage
+from app.journal_store import journal_repository
+from app.journal_search import journal_search_index
+from app.journal_outbox import journal_outbox
+from app.journal import (
+    create_journal_entry, get_journal_entry, get_journal_entries, get_journal_facets,
+    update_journal_entry, delete_journal_entry, search_journal_entries
+)
 
 app = FastAPI(
     title="MentalBloom RAG Service",
@@ -35,28 +53,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage latency histograms and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Initialize services on startup
 @app.on_event("startup")
 async def startup_event():
     try:
-        # Initialize Pinecone
+        # Blocking calls (vector store, embeddings, sync LLM fallbacks) share one bounded pool
+        install_default_executor()
+
+        # Initialize the shared vector backend
+        try:
+            vectorstore_manager.initialize()
+            logger.info(f"Vector backend '{settings.VECTOR_BACKEND}' initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing vector backend '{settings.VECTOR_BACKEND}': {e}")
+
+        # Open the pooled HTTP client for the sentiment and intent services
+        await start_http_client()
+
+        # Start the ingestion workers
+        await ingestion_queue.start()
+
+        # Open the server-side conversation memory
+        await conversation_store.start()
+
+        # Make sure the journal indexes exist
         try:
-            initialize_pinecone()
-            logger.info("Pinecone initialized successfully")
+            await journal_repository.ensure_indexes()
         except Exception as e:
-            logger.error(f"Error initializing Pinecone: {e}")
-            if "Failed to resolve" in str(e) and "pinecone.io" in str(e):
-                logger.error("DNS resolution error: Could not connect to Pinecone.")
-                logger.error(f"Check that your PINECONE_ENVIRONMENT value '{settings.PINECONE_ENVIRONMENT}' is correct.")
-                logger.error("The environment should be a valid Pinecone environment like 'gcp-starter', 'us-west1-gcp', etc.")
-                logger.error("Find your environment in the Pinecone console: https://app.pinecone.io/")
-            elif "Invalid API key" in str(e) or "Unauthorized" in str(e):
-                logger.error("Authentication error: Your Pinecone API key appears to be invalid.")
-                logger.error("Make sure you've set the correct PINECONE_API_KEY in your .env file.")
+            logger.error(f"Error creating journal indexes: {e}")
+
+        # Drain queued journal ingestions in the background
+        await journal_outbox.start()
+
+        # Probe dependencies in the background; /health serves the cached results
+        await health_monitor.start()
 
         # Test Gemini LLM
         try:
-            initialize_gemini_llm()
+            get_llm()
             logger.info("Gemini LLM initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing Gemini LLM: {e}")
@@ -68,6 +105,17 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error during RAG service startup: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_monitor.stop()
+    await journal_outbox.stop()
+    await ingestion_queue.stop()
+    await conversation_store.stop()
+    await close_http_client()
+    vectorstore_manager.close()
+    blocking_executor.shutdown(wait=False)
+    logger.info("RAG service shutdown completed")
+
 @app.get("/")
 async def root():
     return {
@@ -76,45 +124,82 @@ async def root():
         "endpoints": [
             "/chat",
             "/ingest",
-            "/health"
+            "/ingest/bulk",
+            "/ingest/jobs/{job_id}",
+            "/health",
+            "/stats",
+            "/metrics"
         ]
     }
 
-@app.get("/health", response_model=HealthResponse)
-async def health_check():
-    # Check services
-    services = {
-        "gemini": True,
-        "pinecone": True,
-        "sentiment_analysis": True,
-        "intent_recognition": True
-    }
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage and per-endpoint latency histograms in Prometheus format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-    try:
-        initialize_gemini_llm()
-    except Exception as e:
-        logger.error(f"Gemini health check failed: {e}")
-        services["gemini"] = False
+@app.get("/stats")
+async def stats():
+    """Connection reuse, cache and request coalescing counters"""
+    return {
+        "ml_services_http": get_connection_stats(),
+        "response_cache": response_cache.stats(),
+        "singleflight": get_singleflight_stats(),
+        "journal_cache": journal_repository.stats(),
+        "journal_search": journal_search_index.stats(),
+        "journal_outbox": journal_outbox.stats()
+    }
 
-    try:
-        initialize_pinecone()
-    except Exception as e:
-        logger.error(f"Pinecone health check failed: {e}")
-        services["pinecone"] = False
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Latest dependency status from the background health monitor; never probes dependencies itself"""
+    statuses = dict(health_monitor.statuses)
+    services = {name: status.healthy for name, status in statuses.items()}
 
     # We'll consider the service healthy if core components are working
-    status = "healthy" if services["gemini"] and services["pinecone"] else "degraded"
+    core_healthy = all(services.get(name, False) for name in health_monitor.core_dependencies)
+    status = "healthy" if core_healthy else "degraded"
+
+    checked = [s.checked_at for s in statuses.values() if s.latency_ms is not None]
 
     return HealthResponse(
         status=status,
         timestamp=datetime.now(),
         version="1.0.0",
-        services=services
+        services=services,
+        latency_ms={name: s.latency_ms for name, s in statuses.items()},
+        errors={name: s.error for name, s in statuses.items() if s.error},
+        checked_at=min(checked) if checked else None
     )
 
+async def encode_chat_frames(frames, sse: bool):
+    """Serialize streamed chat frames as Server-Sent Events or NDJSON lines"""
+    serialization = 0.0
+    async for frame in frames:
+        start = time.perf_counter()
+        data = json.dumps(frame)
+        serialization += time.perf_counter() - start
+        yield f"data: {data}\n\n" if sse else data + "\n"
+    # One observation per stream rather than one per token
+    record_stage("serialization", serialization)
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Process a chat request through the RAG pipeline"""
+    if request.stream:
+        # Clients asking for text/event-stream get SSE; everyone else gets NDJSON
+        sse = "text/event-stream" in http_request.headers.get("accept", "")
+        frames = stream_chat_request(
+            messages=request.messages,
+            user_id=request.user_id,
+            conversation_id=request.conversation_id,
+            include_sources=request.include_sources
+        )
+        return StreamingResponse(
+            encode_chat_frames(frames, sse),
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     try:
         response = await process_chat_request(
             messages=request.messages,
@@ -124,17 +209,18 @@ async def chat(request: ChatRequest):
             max_tokens=request.max_tokens,
             temperature=request.temperature
         )
-        return response
+        with stage("serialization"):
+            return JSONResponse(jsonable_encoder(response))
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ingest", response_model=DocumentIngestionResponse)
-async def ingest(request: DocumentIngestionRequest, background_tasks: BackgroundTasks):
-    """Ingest a document into the vector store"""
+async def ingest(request: DocumentIngestionRequest):
+    """Queue a document for ingestion into the vector store"""
     try:
-        # Start ingestion in the background
-        result = ingest_document(
+        # Returns immediately; track progress with GET /ingest/jobs/{job_id}
+        job = ingestion_queue.submit(
             title=request.title,
             content=request.content,
             url=request.url,
@@ -142,17 +228,42 @@ async def ingest(request: DocumentIngestionRequest, background_tasks: Background
         )
 
         return DocumentIngestionResponse(
-            document_id=result["document_id"],
-            title=result["title"],
-            chunk_count=result["chunk_count"],
-            status=result["status"],
-            timestamp=datetime.now()
+            document_id=job.document_id,
+            title=job.title,
+            chunk_count=len(job.chunks),
+            status=job.status.value,
+            timestamp=datetime.now(),
+            job_id=job.id
         )
+    except IngestionQueueFull as e:
+        logger.warning(f"Rejecting ingestion request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error ingesting document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ingest/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """Get the status and progress of an ingestion job"""
+    job = ingestion_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.to_response()
 
+@app.post("/ingest/bulk")
+async def ingest_bulk(request: Request):
+    """Ingest NDJSON documents streamed in the request body, streaming back one result per document"""
+    return StreamingResponse(await start_bulk_ingest(request.stream()), media_type="application/x-ndjson")
+
+@app.post("/vectorstore/refresh")
+async def refresh_vectorstore():
+    """Reconnect the shared vector store, e.g. after the index was recreated"""
+    try:
+        vectorstore_manager.refresh()
+        return {"status": "success", "message": "Vector store reconnected"}
+    except Exception as e:
+        logger.error(f"Error refreshing vector store: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/journal", response_model=JournalEntryResponse)
 async def create_journal(entry: JournalEntry):
@@ -164,6 +275,27 @@ async def create_journal(entry: JournalEntry):
         logger.error(f"Error creating journal entry: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Fixed sub-paths go before /journal/{user_id}/{entry_id}, which would otherwise match them
+@app.get("/journal/{user_id}/search", response_model=List[JournalEntryResponse])
+async def search_journals(user_id: str, query: str, limit: int = 5, semantic: bool = False):
+    """Search journal entries by keyword; `semantic=true` fuses in vector search results"""
+    try:
+        results = await search_journal_entries(user_id, query, limit, semantic)
+        return results
+    except Exception as e:
+        logger.error(f"Error searching journal entries: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/journal/{user_id}/facets", response_model=JournalFacetsResponse)
+async def journal_facets(user_id: str):
+    """Tag and mood counts for a user's journal"""
+    try:
+        result = await get_journal_facets(user_id)
+        return JournalFacetsResponse(**result)
+    except Exception as e:
+        logger.error(f"Error getting journal facets: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/journal/{user_id}/{entry_id}", response_model=JournalEntryResponse)
 async def get_journal(user_id: str, entry_id: str):
     """Get a journal entry by ID"""
@@ -183,13 +315,36 @@ async def list_journals(
     user_id: str,
     page: int = 1,
     page_size: int = 10,
-    tag: Optional[str] = None,
-    mood: Optional[str] = None
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: Literal["all", "any"] = "all",
+    mood: Optional[List[str]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None
 ):
-    """List journal entries for a user"""
+    """List journal entries for a user, newest first; page with `after=<next_cursor>`
+
+    The filtered total is counted on the first page only, unless `include_total` says otherwise.
+    Repeat `tag` to require all of the tags (`tag_mode=all`) or any of them (`tag_mode=any`);
+    repeat `mood` to match any of the moods.
+    """
     try:
-        result = await get_journal_entries(user_id, page, page_size, tag, mood)
+        result = await get_journal_entries(
+            user_id,
+            page,
+            page_size,
+            tags=tag,
+            moods=mood,
+            after=after,
+            include_total=include_total,
+            match_all_tags=tag_mode == "all",
+            start_date=start_date,
+            end_date=end_date
+        )
         return JournalEntryListResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing journal entries: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -222,16 +377,6 @@ async def delete_journal(user_id: str, entry_id: str):
         logger.error(f"Error deleting journal entry: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/journal/{user_id}/search", response_model=List[JournalEntryResponse])
-async def search_journals(user_id: str, query: str, limit: int = 5):
-    """Search journal entries"""
-    try:
-        results = await search_journal_entries(user_id, query, limit)
-        return results
-    except Exception as e:
-        logger.error(f"Error searching journal entries: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8002))
@@ -6,46 +6,128 @@ import time
 import asyncio
 
 from app.config import settings
+from app.singleflight import coalesce
+from app.simulation import simulated_sentiment, simulated_intent
 
+# One pooled client per process, created at startup and closed at shutdown
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Connection reuse counters; connections_opened only grows when a request could not reuse a pooled connection
+connection_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "errors": 0
+}
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared, pooled HTTP client for the ML services"""
+    global _http_client
+    if _http_client is None:
+        http2 = settings.ML_HTTP2 and _http2_available()
+        _http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.ML_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ML_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.ML_HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=10.0
+        )
+        logger.info(
+            f"ML services HTTP client started (max_connections={settings.ML_HTTP_MAX_CONNECTIONS}, "
+            f"keepalive={settings.ML_HTTP_MAX_KEEPALIVE}, http2={http2})"
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        connection_stats["connections_opened"] += 1
+
+async def _post(url: str, payload: Dict[str, Any], timeout: float) -> httpx.Response:
+    client = await start_http_client()
+    connection_stats["requests"] += 1
+    try:
+        return await client.post(url, json=payload, timeout=timeout, extensions={"trace": _trace})
+    except Exception:
+        connection_stats["errors"] += 1
+        raise
+
+async def check_service(base_url: str, timeout: float) -> None:
+    """Raise unless an ML service answers its /health endpoint"""
+    if settings.ML_SERVICES_SIMULATED:
+        return
+    client = _http_client or await start_http_client()
+    response = await client.get(f"{base_url}/health", timeout=timeout)
+    response.raise_for_status()
+
+def get_connection_stats() -> Dict[str, Any]:
+    """Request and connection counters for the shared ML services client"""
+    requests = connection_stats["requests"]
+    opened = connection_stats["connections_opened"]
+    return {
+        **connection_stats,
+        "reused_requests": max(requests - opened, 0),
+        "reuse_ratio": (requests - opened) / requests if requests else 0.0
+    }
+
+@coalesce("sentiment")
 async def analyze_sentiment(text: str, user_id: Optional[str] = None, conversation_id: Optional[str] = None):
     """Call the sentiment analysis service to analyze text sentiment"""
+    if settings.ML_SERVICES_SIMULATED:
+        return simulated_sentiment(text)
+
     start_time = time.time()
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{settings.SENTIMENT_SERVICE_URL}/analyze-sentiment",
-                json={
-                    "text": text,
-                    "user_id": user_id,
-                    "conversation_id": conversation_id
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Error from sentiment service: {response.status_code} - {response.text}")
-                return None
-                
-            result = response.json()
-            processing_time = (time.time() - start_time) * 1000  # in milliseconds
-            logger.info(f"Sentiment analysis completed in {processing_time:.2f}ms: {result.get('sentiment')}")
+        response = await _post(
+            f"{settings.SENTIMENT_SERVICE_URL}/analyze-sentiment",
+            {
+                "text": text,
+                "user_id": user_id,
+                "conversation_id": conversation_id
+            },
+            timeout=settings.SENTIMENT_SERVICE_TIMEOUT
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Error from sentiment service: {response.status_code} - {response.text}")
+            return None
             
-            return {
-                "sentiment": result.get("sentiment"),
-                "compound": result.get("compound"),
-                "emotions": {
-                    "happy": result.get("emotions", {}).get("happy", 0),
-                    "angry": result.get("emotions", {}).get("angry", 0),
-                    "surprise": result.get("emotions", {}).get("surprise", 0),
-                    "sad": result.get("emotions", {}).get("sad", 0),
-                    "fear": result.get("emotions", {}).get("fear", 0)
-                },
-                "language": result.get("language", "en")
-            }
+        result = response.json()
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Sentiment analysis completed in {processing_time:.2f}ms: {result.get('sentiment')}")
+        
+        return {
+            "sentiment": result.get("sentiment"),
+            "compound": result.get("compound"),
+            "emotions": {
+                "happy": result.get("emotions", {}).get("happy", 0),
+                "angry": result.get("emotions", {}).get("angry", 0),
+                "surprise": result.get("emotions", {}).get("surprise", 0),
+                "sad": result.get("emotions", {}).get("sad", 0),
+                "fear": result.get("emotions", {}).get("fear", 0)
+            },
+            "language": result.get("language", "en")
+        }
     except Exception as e:
         logger.error(f"Error calling sentiment service: {e}")
         return None
 
+@coalesce("intent")
 async def recognize_intent(
     text: str, 
     user_id: Optional[str] = None, 
@@ -53,34 +135,37 @@ async def recognize_intent(
     previous_messages: Optional[list] = None
 ):
     """Call the intent recognition service to analyze text intent"""
+    if settings.ML_SERVICES_SIMULATED:
+        return simulated_intent(text)
+
     start_time = time.time()
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{settings.INTENT_SERVICE_URL}/recognize-intent",
-                json={
-                    "text": text,
-                    "user_id": user_id,
-                    "conversation_id": conversation_id,
-                    "previous_messages": previous_messages
-                }
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Error from intent service: {response.status_code} - {response.text}")
-                return None
-                
-            result = response.json()
-            processing_time = (time.time() - start_time) * 1000  # in milliseconds
-            logger.info(f"Intent recognition completed in {processing_time:.2f}ms: {result.get('primary_intent')}")
+        response = await _post(
+            f"{settings.INTENT_SERVICE_URL}/recognize-intent",
+            {
+                "text": text,
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "previous_messages": previous_messages
+            },
+            timeout=settings.INTENT_SERVICE_TIMEOUT
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Error from intent service: {response.status_code} - {response.text}")
+            return None
             
-            return {
-                "primary_intent": result.get("primary_intent"),
-                "confidence": result.get("confidence"),
-                "is_emergency": result.get("is_emergency", False),
-                "suggested_response_type": result.get("suggested_response_type")
-            }
+        result = response.json()
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Intent recognition completed in {processing_time:.2f}ms: {result.get('primary_intent')}")
+        
+        return {
+            "primary_intent": result.get("primary_intent"),
+            "confidence": result.get("confidence"),
+            "is_emergency": result.get("is_emergency", False),
+            "suggested_response_type": result.get("suggested_response_type")
+        }
     except Exception as e:
         logger.error(f"Error calling intent service: {e}")
         return None
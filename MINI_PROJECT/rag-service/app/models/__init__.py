@@ -1,6 +1,6 @@
 # Import models here
 from app.models.emotion import EmotionCreate, EmotionResponse, Emotion
 from app.models.chat import ChatRequest, ChatResponse, Message, Source, MessageRole, SentimentInfo, IntentInfo
-from app.models.document import DocumentIngestionRequest, DocumentIngestionResponse
+from app.models.document import DocumentIngestionRequest, DocumentIngestionResponse, IngestionJobResponse
 from app.models.health import HealthResponse
-from app.models.journal import JournalEntry, JournalEntryResponse, JournalEntryListResponse
+from app.models.journal import JournalEntry, JournalEntryResponse, JournalEntryListResponse, JournalFacetsResponse
@@ -19,6 +19,7 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     user_id: Optional[str] = None
     conversation_id: Optional[str] = None
+    stream: bool = False
     include_sources: bool = False
     max_tokens: Optional[int] = None
     temperature: Optional[float] = 0.7
@@ -48,4 +49,5 @@ class ChatResponse(BaseModel):
     conversation_id: Optional[str] = None
     sentiment: Optional[str] = None
     intent: Optional[str] = None
+    is_emergency: bool = False
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -16,3 +16,18 @@ class DocumentIngestionResponse(BaseModel):
     chunk_count: int
     status: str
     timestamp: datetime
+    job_id: Optional[str] = None
+
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    document_id: str
+    title: str
+    status: str
+    attempts: int
+    chunk_count: int
+    chunks_embedded: int
+    chunks_upserted: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -8,3 +8,6 @@ class HealthResponse(BaseModel):
     timestamp: datetime
     version: str
     services: Dict[str, bool]
+    latency_ms: Dict[str, Optional[float]] = {}
+    errors: Dict[str, str] = {}
+    checked_at: Optional[datetime] = None
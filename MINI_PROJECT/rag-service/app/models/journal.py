@@ -4,6 +4,7 @@ from datetime import datetime
 
 
 class JournalEntry(BaseModel):
+    id: Optional[str] = None
     user_id: str
     title: str
     content: str
@@ -22,10 +23,20 @@ class JournalEntryResponse(BaseModel):
     tags: List[str] = []
     created_at: datetime
     updated_at: Optional[datetime] = None
+    document_id: Optional[str] = None
+    ingested: bool = False
 
 
 class JournalEntryListResponse(BaseModel):
     entries: List[JournalEntryResponse]
-    total: int
+    total: Optional[int] = None  # entries matching the filters; omitted when include_total=false
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # pass as `after` to get the next page
+    has_more: bool = False
+
+
+class JournalFacetsResponse(BaseModel):
+    user_id: str
+    tags: Dict[str, int] = {}  # tag -> number of entries
+    moods: Dict[str, int] = {}  # mood -> number of entries
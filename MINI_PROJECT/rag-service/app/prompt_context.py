@@ -0,0 +1,132 @@
+import math
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.models import Message, MessageRole
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    """Load the tiktoken encoding once; None means fall back to the character estimate"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+    except Exception as e:
+        # tiktoken missing, or its encoding file cannot be fetched (offline)
+        logger.warning(f"tiktoken unavailable, estimating tokens as characters / 4: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]) + "..."
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def format_document(index: int, doc: Dict[str, Any], content: str) -> str:
+    return f"[{index}] {doc.get('title', 'Untitled')}\nContent: {content}\n\n"
+
+
+class PromptContext:
+    """The documents and history that fit the prompt, with tokens used per section"""
+
+    def __init__(self, documents_text: str, chat_history: List[Message], usage: Dict[str, int]):
+        self.documents_text = documents_text
+        self.chat_history = chat_history
+        self.usage = usage
+
+
+def assemble_context(
+    user_input: str,
+    retrieved_documents: List[Dict[str, Any]],
+    chat_history: Optional[List[Message]] = None,
+    budget: Optional[int] = None,
+    document_share: Optional[float] = None,
+    max_document_tokens: Optional[int] = None
+) -> PromptContext:
+    """Fit documents and chat history into a token budget
+
+    The user's input is always kept. Documents get up to ``document_share`` of what is left,
+    most relevant first, each trimmed to ``max_document_tokens``; history gets the rest,
+    newest turns first, so the oldest turns are the ones dropped. System messages are always kept.
+    """
+    budget = budget if budget is not None else settings.PROMPT_TOKEN_BUDGET
+    document_share = document_share if document_share is not None else settings.PROMPT_DOCUMENT_SHARE
+    max_document_tokens = max_document_tokens if max_document_tokens is not None else settings.PROMPT_MAX_DOCUMENT_TOKENS
+
+    input_tokens = count_tokens(user_input)
+    remaining = max(budget - input_tokens, 0)
+
+    # Documents: most relevant first, each trimmed, until their share is used up
+    document_budget = int(remaining * document_share)
+    ranked = sorted(retrieved_documents, key=lambda d: d.get("relevance_score", 0), reverse=True)
+    documents_text = ""
+    document_tokens = 0
+    included = 0
+    for doc in ranked:
+        content = truncate_to_tokens(doc.get("content", ""), max_document_tokens)
+        block = format_document(included + 1, doc, content)
+        block_tokens = count_tokens(block)
+        if document_tokens + block_tokens > document_budget:
+            # Squeeze in a shorter version of the chunk if a useful amount still fits
+            space = document_budget - document_tokens - count_tokens(format_document(included + 1, doc, ""))
+            if space < 32:
+                break
+            block = format_document(included + 1, doc, truncate_to_tokens(content, space))
+            block_tokens = count_tokens(block)
+        documents_text += block
+        document_tokens += block_tokens
+        included += 1
+    remaining -= document_tokens
+
+    # History: client system messages are kept, then turns newest first until the budget runs out
+    chat_history = chat_history or []
+    kept = set()
+    history_tokens = 0
+    for i, message in enumerate(chat_history):
+        if message.role == MessageRole.SYSTEM:
+            kept.add(i)
+            history_tokens += count_tokens(message.content)
+    for i in reversed(range(len(chat_history))):
+        if i in kept:
+            continue
+        message_tokens = count_tokens(chat_history[i].content)
+        if history_tokens + message_tokens > remaining:
+            break
+        kept.add(i)
+        history_tokens += message_tokens
+    history = [message for i, message in enumerate(chat_history) if i in kept]
+
+    usage = {
+        "budget": budget,
+        "input": input_tokens,
+        "documents": document_tokens,
+        "history": history_tokens,
+        "total": input_tokens + document_tokens + history_tokens,
+        "documents_included": included,
+        "documents_dropped": len(retrieved_documents) - included,
+        "history_included": len(history),
+        "history_dropped": len(chat_history) - len(history)
+    }
+    return PromptContext(documents_text, history, usage)
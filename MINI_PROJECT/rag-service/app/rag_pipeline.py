@@ -1,106 +1,265 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Awaitable, AsyncIterator, Tuple
 from loguru import logger
 import time
 import asyncio
 import json
 import uuid
 
-from app.llm import initialize_gemini_llm, generate_response
-from app.vectorstore import retrieve_relevant_documents
+from app.llm import get_llm, generate_response, stream_response, prompt_key, generation_status
+from app.vectorstore import retrieve_multi_source, SearchSpec, get_embedding_model
+from app.response_cache import response_cache, document_ids
+from app.executor import run_blocking
+from app.conversations import conversation_store
+from app.singleflight import coalesce
+from mentalbloom_common.metrics import stage, record_stage
+from app.crisis import detect_crisis, CRISIS_RESPONSE, LOCAL_CRISIS_INTENT
 from app.ml_services import analyze_text
 from app.models import Message, Source, SentimentInfo, IntentInfo, ChatResponse
 from app.config import settings
 
-async def process_chat_request(
+async def run_stage(name: str, coro: Awaitable[Any], timeout: float, default: Any) -> Any:
+    """Run one pipeline stage within its own time budget, falling back to a default on timeout"""
+    start_time = time.time()
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Chat stage '{name}' timed out after {timeout}s; continuing without it")
+        return default
+    finally:
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        record_stage(name, processing_time / 1000)
+        logger.info(f"Chat stage '{name}' finished in {processing_time:.2f}ms")
+
+async def prepare_chat_context(
     messages: List[Message],
     user_id: Optional[str] = None,
-    conversation_id: Optional[str] = None,
-    include_sources: bool = True,
-    max_tokens: Optional[int] = None,
-    temperature: Optional[float] = None
-) -> ChatResponse:
-    """Process a chat request through the RAG pipeline"""
-    start_time = time.time()
+    conversation_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run the analysis and retrieval stages that every chat turn needs before generation
 
-    try:
+    Turns flagged as emergencies (by the local phrase check or the intent service) come back
+    with ``emergency`` set and no documents.
+    """
+    # Get the user's latest message
+    user_message = next((m for m in reversed(messages) if m.role == "user"), None)
+    if not user_message:
+        raise ValueError("No user message found in the conversation")
 
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
+    # Known conversations use the server-side summary and recent turns instead of the resent messages
+    state = await conversation_store.load(conversation_id) if conversation_id else None
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
 
-        # Get the user's latest message
-        user_message = next((m for m in reversed(messages) if m.role == "user"), None)
-        if not user_message:
-            raise ValueError("No user message found in the conversation")
+    if state is not None:
+        chat_history = [m for m in messages[:-1] if m.role == "system"] + state.history()
+    else:
+        chat_history = messages[:-1]
 
-        # Get previous messages
-        previous_messages = [m.content for m in messages if m.role == "user" or m.role == "assistant"]
+    # Get previous messages
+    previous_messages = [m.content for m in chat_history if m.role == "user" or m.role == "assistant"]
 
+    # Searches: the user's own journal first, then general resources
+    searches = []
+    if user_id:
+        searches.append(SearchSpec(
+            k=settings.MAX_DOCUMENTS // 2,
+            filter={"user_id": user_id, "type": "journal_entry"},
+            name="journal_retrieval"
+        ))
+    searches.append(SearchSpec(k=settings.MAX_DOCUMENTS, name="general_retrieval"))
 
-        analysis_result = await analyze_text(
-            user_message.content,
-            user_id=user_id,
-            conversation_id=conversation_id,
-            previous_messages=previous_messages[:-1] if len(previous_messages) > 1 else None
+    context = {
+        "conversation_id": conversation_id,
+        "user_message": user_message,
+        "chat_history": chat_history,
+        "stored_conversation": state is not None,
+        "sentiment_info": None,
+        "intent_info": None,
+        "relevant_docs": [],
+        "emergency": False
+    }
+
+    # Crisis language takes the fast path without waiting on the intent service
+    with stage("crisis_check"):
+        crisis = detect_crisis(user_message.content)
+    if crisis:
+        logger.warning(f"Crisis language detected locally in conversation {conversation_id}; using the emergency fast path")
+        context["intent_info"] = dict(LOCAL_CRISIS_INTENT)
+        context["emergency"] = True
+        return context
+
+    # Retrieval does not depend on sentiment or intent, so both stages start at the same time
+    retrieval = asyncio.ensure_future(run_stage(
+        "retrieval",
+        retrieve_multi_source(
+            query=user_message.content,
+            searches=searches,
+            limit=settings.MAX_DOCUMENTS
+        ),
+        timeout=settings.RETRIEVAL_TIMEOUT,
+        default=[]
+    ))
+    try:
+        analysis_result = await run_stage(
+            "analysis",
+            analyze_text(
+                user_message.content,
+                user_id=user_id,
+                conversation_id=conversation_id,
+                previous_messages=previous_messages or None
+            ),
+            timeout=settings.ANALYSIS_TIMEOUT,
+            default={"sentiment": None, "intent": None}
         )
+    except BaseException:
+        retrieval.cancel()
+        raise
 
-        sentiment_info = analysis_result.get("sentiment")
-        intent_info = analysis_result.get("intent")
+    context["sentiment_info"] = analysis_result.get("sentiment")
+    context["intent_info"] = analysis_result.get("intent")
 
+    if context["intent_info"] and context["intent_info"].get("is_emergency"):
+        # The crisis response uses no documents, so it does not wait for them
+        logger.warning(f"Intent service flagged an emergency in conversation {conversation_id}; using the emergency fast path")
+        retrieval.cancel()
+        context["emergency"] = True
+        return context
 
-        journal_docs = []
-        if user_id:
-            journal_docs = retrieve_relevant_documents(
-                query=user_message.content,
-                k=settings.MAX_DOCUMENTS // 2,
-                filter={"user_id": user_id, "type": "journal_entry"}
-            )
+    relevant_docs = await retrieval
+    context["relevant_docs"] = relevant_docs
 
-            if journal_docs:
-                logger.info(f"Found {len(journal_docs)} relevant journal entries")
+    journal_count = sum(1 for doc in relevant_docs if doc["metadata"].get("type") == "journal_entry")
+    if journal_count:
+        logger.info(f"Found {journal_count} relevant journal entries")
 
+    return context
 
-        general_docs = retrieve_relevant_documents(
-            query=user_message.content,
-            k=settings.MAX_DOCUMENTS - len(journal_docs)  # Use remaining slots
-        )
+def record_conversation_turn(context: Dict[str, Any], response_text: str) -> None:
+    """Store the exchange; conversations seen for the first time are seeded with the client's history"""
+    conversation_store.record_turn(
+        context["conversation_id"],
+        context["user_message"].content,
+        response_text,
+        history=None if context["stored_conversation"] else context["chat_history"]
+    )
 
+def build_sources(relevant_docs: List[Dict[str, Any]], include_sources: bool) -> List[Source]:
+    """Convert retrieved documents to response sources"""
+    sources = []
+    if include_sources and relevant_docs:
+        for doc in relevant_docs:
+            sources.append(Source(
+                title=doc.get("title", "Untitled"),
+                url=doc.get("url"),
+                content_snippet=doc.get("content_snippet", ""),
+                relevance_score=doc.get("relevance_score", 0)
+            ))
+    return sources
 
-        relevant_docs = journal_docs + general_docs
+async def response_cache_key(context: Dict[str, Any]) -> Optional[Tuple[Tuple, List[float]]]:
+    """Return the (bucket, query embedding) for turns whose answer may be shared, else None"""
+    # Answers that depend on the user's journal, the conversation so far, or a crisis are never shared
+    if any(doc["metadata"].get("type") == "journal_entry" for doc in context["relevant_docs"]):
+        return None
+    if context["intent_info"] and context["intent_info"].get("is_emergency"):
+        return None
+    if any(m.role in ("user", "assistant") for m in context["chat_history"]):
+        return None
 
+    # Already embedded for retrieval, so this is an embedding cache hit
+    embedding = await run_blocking(get_embedding_model().embed_query, context["user_message"].content)
+    bucket = (
+        prompt_key(context["sentiment_info"], context["intent_info"]),
+        document_ids(context["relevant_docs"])
+    )
+    return bucket, embedding
 
+def _labels(context: Dict[str, Any]) -> Dict[str, Any]:
+    sentiment_info = context["sentiment_info"]
+    intent_info = context["intent_info"]
+    return {
+        "sentiment": sentiment_info.get("sentiment") if sentiment_info else None,
+        "intent": intent_info.get("primary_intent") if intent_info else None,
+        "is_emergency": context["emergency"]
+    }
 
-        llm = initialize_gemini_llm()
+async def _generate(context: Dict[str, Any]) -> str:
+    """Generate a complete answer; only the LLM call waits on both stages, within its own budget"""
+    try:
+        with stage("llm"):
+            response_text, _ = await asyncio.wait_for(
+                generate_response(
+                    llm=get_llm(),
+                    user_input=context["user_message"].content,
+                    retrieved_documents=context["relevant_docs"],
+                    chat_history=context["chat_history"],
+                    sentiment_info=context["sentiment_info"],
+                    intent_info=context["intent_info"]
+                ),
+                timeout=settings.LLM_TIMEOUT
+            )
+    except Exception as e:
+        generation_status.record_failure(e)
+        raise
+    generation_status.record_success()
+    return response_text
 
-        response_text, llm_time = generate_response(
-            llm=llm,
-            user_input=user_message.content,
-            retrieved_documents=relevant_docs,
-            chat_history=messages[:-1],
-            sentiment_info=sentiment_info,
-            intent_info=intent_info
-        )
+# A request without a conversation_id starts a new conversation, which must not be shared
+@coalesce("chat", when=lambda arguments: arguments["conversation_id"] is not None)
+async def process_chat_request(
+    messages: List[Message],
+    user_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    include_sources: bool = True,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None
+) -> ChatResponse:
+    """Process a chat request through the RAG pipeline"""
+    start_time = time.time()
 
+    try:
+        context = await prepare_chat_context(messages, user_id, conversation_id)
+
+        if context["emergency"]:
+            # Precomputed reply, optionally followed by a generated answer as in the streaming path
+            record_stage("crisis_response", time.time() - start_time)
+            response_text = CRISIS_RESPONSE
+            if settings.EMERGENCY_FOLLOW_UP:
+                try:
+                    response_text += "\n\n" + await _generate(context)
+                except Exception as e:
+                    # The crisis resources go out regardless; a failed follow-up is not an error for the client
+                    logger.error(f"Error generating emergency follow-up: {e}")
+            record_conversation_turn(context, response_text)
+            processing_time = (time.time() - start_time) * 1000  # in milliseconds
+            logger.info(f"Emergency chat request answered in {processing_time:.2f}ms")
+            return ChatResponse(
+                message=response_text,
+                sources=[],
+                conversation_id=context["conversation_id"],
+                **_labels(context)
+            )
 
-        sources = []
-        if include_sources and relevant_docs:
-            for doc in relevant_docs:
-                sources.append(Source(
-                    title=doc.get("title", "Untitled"),
-                    url=doc.get("url"),
-                    content_snippet=doc.get("content_snippet", ""),
-                    relevance_score=doc.get("relevance_score", 0)
-                ))
+        cache_key = await response_cache_key(context)
+        response_text = response_cache.get(*cache_key) if cache_key else None
+
+        if response_text is None:
+            response_text = await _generate(context)
+            if cache_key:
+                response_cache.set(*cache_key, response_text)
+        else:
+            logger.info("Serving chat response from the response cache")
+
+        record_conversation_turn(context, response_text)
 
         # Calculate total processing time
         processing_time = (time.time() - start_time) * 1000  # in milliseconds
 
-
         response = ChatResponse(
             message=response_text,
-            sources=sources,
-            sentiment=sentiment_info.get('sentiment') if sentiment_info else None,
-            intent=intent_info.get('intent') if intent_info else None,
-            conversation_id=conversation_id
+            sources=build_sources(context["relevant_docs"], include_sources),
+            conversation_id=context["conversation_id"],
+            **_labels(context)
         )
 
         logger.info(f"Chat request processed in {processing_time:.2f}ms")
@@ -109,3 +268,110 @@ async def process_chat_request(
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
         raise
+
+async def _stream_generation(context: Dict[str, Any], tokens: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield token frames from the LLM, collecting the text into ``tokens``
+
+    Generation gets ``LLM_TIMEOUT`` seconds from its own start; waiting for each token is
+    bounded by what is left, so a stalled stream fails instead of hanging.
+    """
+    llm = get_llm()
+    llm_start = time.perf_counter()
+    deadline = llm_start + settings.LLM_TIMEOUT
+
+    stream = stream_response(
+        llm=llm,
+        user_input=context["user_message"].content,
+        retrieved_documents=context["relevant_docs"],
+        chat_history=context["chat_history"],
+        sentiment_info=context["sentiment_info"],
+        intent_info=context["intent_info"]
+    )
+    try:
+        while True:
+            try:
+                token = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - time.perf_counter(), 0))
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"Response generation exceeded {settings.LLM_TIMEOUT}s")
+
+            if not tokens:
+                record_stage("llm_first_token", time.perf_counter() - llm_start)
+            tokens.append(token)
+            yield {"type": "token", "content": token}
+    except Exception as e:
+        generation_status.record_failure(e)
+        raise
+    finally:
+        await stream.aclose()
+
+    generation_status.record_success()
+    record_stage("llm", time.perf_counter() - llm_start)
+
+async def stream_chat_request(
+    messages: List[Message],
+    user_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    include_sources: bool = True
+) -> AsyncIterator[Dict[str, Any]]:
+    """Process a chat request, yielding a metadata frame, token frames and a final done frame
+
+    Emergencies get a ``crisis`` frame with the precomputed crisis response right after the
+    metadata, optionally followed by generated token frames.
+    """
+    start_time = time.time()
+
+    try:
+        context = await prepare_chat_context(messages, user_id, conversation_id)
+
+        # Sources and analysis are known before generation starts, so they lead the stream
+        yield {
+            "type": "metadata",
+            "conversation_id": context["conversation_id"],
+            "sources": [source.dict() for source in build_sources(context["relevant_docs"], include_sources)],
+            **_labels(context)
+        }
+
+        if context["emergency"]:
+            yield {"type": "crisis", "content": CRISIS_RESPONSE}
+            record_stage("crisis_response", time.time() - start_time)
+
+            response_text = CRISIS_RESPONSE
+            if settings.EMERGENCY_FOLLOW_UP:
+                tokens: List[str] = []
+                try:
+                    async for frame in _stream_generation(context, tokens):
+                        yield frame
+                except Exception as e:
+                    # The crisis resources are already out; a failed follow-up is not an error for the client
+                    logger.error(f"Error generating emergency follow-up: {e}")
+                if tokens:
+                    response_text += "\n\n" + "".join(tokens)
+            record_conversation_turn(context, response_text)
+        else:
+            cache_key = await response_cache_key(context)
+            cached = response_cache.get(*cache_key) if cache_key else None
+
+            if cached is not None:
+                logger.info("Serving streamed chat response from the response cache")
+                yield {"type": "token", "content": cached}
+                record_conversation_turn(context, cached)
+            else:
+                tokens = []
+                async for frame in _stream_generation(context, tokens):
+                    yield frame
+
+                # Only complete answers are cached and remembered
+                response_text = "".join(tokens)
+                if cache_key:
+                    response_cache.set(*cache_key, response_text)
+                record_conversation_turn(context, response_text)
+
+        processing_time = (time.time() - start_time) * 1000  # in milliseconds
+        logger.info(f"Streamed chat request processed in {processing_time:.2f}ms")
+        yield {"type": "done", "processing_time_ms": processing_time}
+
+    except Exception as e:
+        logger.error(f"Error streaming chat request: {e}")
+        yield {"type": "error", "error": str(e)}
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Hashable, FrozenSet
+
+import numpy as np
+
+from app.config import settings
+
+
+def document_ids(documents: List[Dict[str, Any]]) -> FrozenSet[str]:
+    """Identify retrieved chunks by document id and content hash, independent of order"""
+    ids = set()
+    for doc in documents:
+        digest = hashlib.sha1(doc.get("content", "").encode("utf-8")).hexdigest()[:16]
+        ids.add(f"{doc.get('metadata', {}).get('document_id')}:{digest}")
+    return frozenset(ids)
+
+
+class _CachedResponse:
+    __slots__ = ("bucket", "vector", "response", "expires_at")
+
+    def __init__(self, bucket: Hashable, vector: np.ndarray, response: str, expires_at: float):
+        self.bucket = bucket
+        self.vector = vector
+        self.response = response
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """LRU cache of generated answers matched by query-embedding similarity within a bucket
+
+    A bucket is the exact context the answer was generated from (retrieved documents and
+    prompt variant); within it, any cached query whose cosine similarity reaches the
+    threshold is a hit.
+    """
+
+    def __init__(self, max_size: int, ttl: int, threshold: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, _CachedResponse]" = OrderedDict()
+        self._buckets: Dict[Hashable, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, bucket: Hashable, embedding: List[float]) -> Optional[str]:
+        vector = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._buckets.get(bucket, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                score = float(entry.vector @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].response
+
+    def set(self, bucket: Hashable, embedding: List[float], response: str) -> None:
+        if self.max_size <= 0:
+            return
+        entry = _CachedResponse(bucket, self._normalize(embedding), response, time.time() + self.ttl)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._buckets[entry.bucket]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[entry.bucket]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+response_cache = ResponseCache(
+    max_size=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.CACHE_TTL,
+    threshold=settings.RESPONSE_CACHE_THRESHOLD
+)
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import math
+import random
+import time
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.config import settings
+
+_VOCABULARY = (
+    "it sounds like you are carrying a lot right now and that is completely understandable "
+    "many people find that small steps such as breathing slowly taking a short walk writing "
+    "down your thoughts or talking with someone you trust can help when feelings become "
+    "overwhelming if things feel unmanageable please consider reaching out to a mental health "
+    "professional who can support you"
+).split()
+
+
+def _rng(*parts: Any) -> random.Random:
+    """A random generator seeded from the given parts, so equal inputs behave identically"""
+    digest = hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+class SimulatedChatModel(BaseChatModel):
+    """Offline stand-in for Gemini with a tunable latency profile
+
+    Time to first token is lognormal with mean ``latency_ms``; tokens then arrive at
+    ``tokens_per_second``. Text and timing are derived from the prompt and ``seed``, so a
+    benchmark replays identically.
+    """
+
+    latency_ms: float = 400.0
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 50.0
+    response_tokens: int = 150
+    seed: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "latency_sigma": self.latency_sigma,
+            "tokens_per_second": self.tokens_per_second,
+            "response_tokens": self.response_tokens,
+            "seed": self.seed
+        }
+
+    def _plan(self, messages: List[BaseMessage]) -> tuple:
+        """Return (seconds to first token, seconds per token, tokens) for a prompt"""
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = _rng(self.seed, prompt)
+
+        # Lognormal with the configured mean: mu = ln(mean) - sigma^2 / 2
+        sigma = max(self.latency_sigma, 0.0)
+        mean = max(self.latency_ms, 0.0) / 1000
+        first_token = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        tokens = [rng.choice(_VOCABULARY) for _ in range(max(self.response_tokens, 1))]
+        tokens[0] = tokens[0].capitalize()
+        tokens = [token + " " for token in tokens[:-1]] + [tokens[-1] + "."]
+        return first_token, per_token, tokens
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        first_token, per_token, tokens = self._plan(messages)
+        time.sleep(first_token + per_token * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        first_token, per_token, tokens = self._plan(messages)
+        await asyncio.sleep(first_token + per_token * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        first_token, per_token, tokens = self._plan(messages)
+        time.sleep(first_token)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(per_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        first_token, per_token, tokens = self._plan(messages)
+        await asyncio.sleep(first_token)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(per_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def create_simulated_llm() -> SimulatedChatModel:
+    return SimulatedChatModel(
+        latency_ms=settings.SIMULATED_LLM_LATENCY_MS,
+        latency_sigma=settings.SIMULATED_LLM_LATENCY_SIGMA,
+        tokens_per_second=settings.SIMULATED_LLM_TOKENS_PER_SECOND,
+        response_tokens=settings.SIMULATED_LLM_RESPONSE_TOKENS,
+        seed=settings.SIMULATED_LLM_SEED
+    )
+
+
+def simulated_sentiment(text: str) -> Dict[str, Any]:
+    """Canned sentiment result, stable for a given text"""
+    rng = _rng("sentiment", text)
+    emotions = {emotion: round(rng.random(), 2) for emotion in ("happy", "angry", "surprise", "sad", "fear")}
+    compound = round(rng.uniform(-1, 1), 3)
+    sentiment = "positive" if compound > 0.05 else "negative" if compound < -0.05 else "neutral"
+    return {"sentiment": sentiment, "compound": compound, "emotions": emotions, "language": "en"}
+
+
+def simulated_intent(text: str) -> Dict[str, Any]:
+    """Canned intent result; never an emergency"""
+    rng = _rng("intent", text)
+    intent = rng.choice(["seeking_help", "sharing_feelings", "seeking_information", "general_chat"])
+    return {
+        "primary_intent": intent,
+        "confidence": round(rng.uniform(0.5, 1.0), 2),
+        "is_emergency": False,
+        "suggested_response_type": "supportive"
+    }
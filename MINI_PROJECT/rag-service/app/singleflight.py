@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+# Every coalescing group, by name, for /stats
+flights: Dict[str, "SingleFlight"] = {}
+
+
+def _jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    return str(value)
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable hash of the arguments that identify a unit of work"""
+    payload = json.dumps(parts, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Runs identical concurrent calls once and hands every caller the same result
+
+    The work runs in its own task, so a caller that disconnects does not cancel it for the
+    others. Results are shared, not copied; callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed = 0
+        self.shared = 0
+        self._calls: Dict[str, asyncio.Task] = {}
+        flights[name] = self
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        else:
+            self.shared += 1
+            logger.debug(f"Coalesced in-flight {self.name} call")
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
+
+
+def coalesce(name: str, when: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Callable:
+    """Decorate a coroutine function so identical concurrent calls share one execution
+
+    ``when`` receives the bound arguments; calls for which it returns False always run on
+    their own, e.g. when the work creates something that must not be shared.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        flight = SingleFlight(name)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Bind so positional and keyword spellings of the same call share a key
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if when is not None and not when(bound.arguments):
+                return await func(*args, **kwargs)
+            key = flight_key(func.__qualname__, bound.arguments)
+            return await flight.do(key, func, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+    return decorator
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, int]]:
+    return {name: flight.stats() for name, flight in flights.items()}
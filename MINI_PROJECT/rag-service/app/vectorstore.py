@@ -1,25 +1,35 @@
-from pinecone import Pinecone as PineconeClient
-from langchain_pinecone import PineconeVectorStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
 from loguru import logger
+import asyncio
 import time
 import uuid
 import json
+import threading
+from functools import lru_cache
 
 from app.config import settings
+from app.backends import VectorBackend, create_backend
+from app.embedding_cache import CachedEmbeddings, create_redis_client
+from app.executor import run_blocking
+from app.singleflight import coalesce
+from mentalbloom_common.metrics import stage
 
 # Initialize Google Generative AI Embeddings
+@lru_cache(maxsize=None)
 def get_embedding_model():
-    """Initialize the embedding model"""
+    """Initialize the embedding model once per process"""
     try:
         # Use a simple embedding model that doesn't require downloading large files
-        from langchain_community.embeddings import FakeEmbeddings
+        from langchain_community.embeddings import FakeEmbeddings, DeterministicFakeEmbedding
         import numpy as np
 
+        # Simulated mode needs the same vector for the same text across runs and processes
+        base = DeterministicFakeEmbedding if settings.SIMULATED_MODE else FakeEmbeddings
+
         # Create a custom FakeEmbeddings class that returns regular floats instead of numpy float64
-        class CustomFakeEmbeddings(FakeEmbeddings):
+        class CustomFakeEmbeddings(base):
             def embed_documents(self, texts):
                 embeddings = super().embed_documents(texts)
                 # Convert numpy float64 to regular float
@@ -34,152 +44,124 @@ def get_embedding_model():
         embeddings = CustomFakeEmbeddings(size=1024)
         logger.info(f"Fake embedding model initialized with 1024 dimensions")
         logger.info(f"Note: This is a placeholder. In production, use a real embedding model.")
-        return embeddings
-    except Exception as e:
-        logger.error(f"Error initializing embedding model: {e}")
-        raise
 
-def initialize_pinecone():
-    """Initialize Pinecone client and connect to the index"""
-    try:
-        # Initialize Pinecone with the API key
-        pc = PineconeClient(api_key=settings.PINECONE_API_KEY)
-
-        # Get list of indexes
-        indexes = pc.list_indexes().names()
-        logger.info(f"Available Pinecone indexes: {indexes}")
-
-        # Check if index exists
-        index_exists = settings.PINECONE_INDEX_NAME in indexes
-
-        # If index doesn't exist, create it (though this shouldn't happen with your existing index)
-        if not index_exists:
-            logger.info(f"Creating Pinecone index: {settings.PINECONE_INDEX_NAME}")
-            # Create the index with the specified dimensions
-            pc.create_index(
-                name=settings.PINECONE_INDEX_NAME,
-                dimension=settings.EMBEDDING_DIMENSION,
-                metric="cosine"
-            )
-
-        # Connect to the index
-        index = pc.Index(settings.PINECONE_INDEX_NAME)
-        logger.info(f"Connected to Pinecone index: {settings.PINECONE_INDEX_NAME}")
-
-        return index
+        # Reuse embeddings for text we have already seen (re-ingests, repeated questions)
+        return CachedEmbeddings(
+            embeddings,
+            model_id="fake-deterministic-1024" if settings.SIMULATED_MODE else "fake-1024",
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            redis_client=create_redis_client(),
+            ttl=settings.EMBEDDING_CACHE_TTL
+        )
     except Exception as e:
-        error_msg = f"Error initializing Pinecone: {e}"
-        logger.error(error_msg)
-
-        # Provide more helpful error messages for common issues
-        if "Failed to resolve" in str(e) and "pinecone.io" in str(e):
-            logger.error("DNS resolution error: Could not connect to Pinecone.")
-            logger.error(f"Check that your PINECONE_ENVIRONMENT value '{settings.PINECONE_ENVIRONMENT}' is correct.")
-            logger.error("The environment should be a valid Pinecone environment like 'gcp-starter', 'us-west1-gcp', etc.")
-            logger.error("Find your environment in the Pinecone console: https://app.pinecone.io/")
-        elif "Invalid API key" in str(e) or "Unauthorized" in str(e):
-            logger.error("Authentication error: Your Pinecone API key appears to be invalid.")
-            logger.error("Make sure you've set the correct PINECONE_API_KEY in your .env file.")
-
+        logger.error(f"Error initializing embedding model: {e}")
         raise
 
-def get_vectorstore():
-    """Get the Pinecone vector store with the embedding model"""
-    try:
-        embeddings = get_embedding_model()
-
-        try:
-            # Initialize Pinecone with the API key
-            pc = PineconeClient(api_key=settings.PINECONE_API_KEY)
-
-            # Get list of indexes
-            indexes = pc.list_indexes().names()
-            index_exists = settings.PINECONE_INDEX_NAME in indexes
-
-            if not index_exists:
-                logger.warning(f"Index {settings.PINECONE_INDEX_NAME} not found. Creating it...")
-                # Create the index with the specified dimensions
-                pc.create_index(
-                    name=settings.PINECONE_INDEX_NAME,
-                    dimension=settings.EMBEDDING_DIMENSION,
-                    metric="cosine"
-                )
-                logger.info(f"Successfully created Pinecone index: {settings.PINECONE_INDEX_NAME}")
-
-            # Create Langchain Pinecone vectorstore
-
-            # Create the vectorstore with the index
-            vectorstore = PineconeVectorStore(
-                pinecone_api_key=settings.PINECONE_API_KEY,
-                index_name=settings.PINECONE_INDEX_NAME,
-                embedding=embeddings,
-                text_key="text",
-                namespace=settings.PINECONE_NAMESPACE
-            )
-
-            logger.info(f"Vector store initialized with namespace: {settings.PINECONE_NAMESPACE}")
-            return vectorstore
-
-        except Exception as e:
-            error_msg = str(e)
-            logger.warning(f"Error accessing existing index: {error_msg}")
-            raise
-
-    except Exception as e:
-        logger.error(f"Error getting vector store: {e}")
-        if "No active indexes found" in str(e) or "Index not found" in str(e):
-            error_msg = "No active indexes found in your Pinecone project. "
-            error_msg += "Please check your Pinecone account and make sure you have permission to create indexes. "
-            error_msg += "You may need to upgrade your Pinecone plan if you've reached the index limit."
-            raise Exception(error_msg)
-        raise
+class VectorStoreManager:
+    """Owns the process-wide vector backend and hands out the shared handle"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend: Optional[VectorBackend] = None
+
+    def initialize(self) -> VectorBackend:
+        """Build the configured backend once"""
+        with self._lock:
+            if self._backend is None:
+                self._connect()
+            return self._backend
+
+    def _connect(self):
+        self._backend = create_backend(settings.VECTOR_BACKEND, get_embedding_model())
+        logger.info(f"Vector backend ready: {self._backend.name}")
+
+    def get_backend(self) -> VectorBackend:
+        """Return the shared backend, connecting on first use"""
+        backend = self._backend
+        if backend is None:
+            backend = self.initialize()
+        return backend
+
+    def refresh(self) -> VectorBackend:
+        """Drop the current backend and reconnect"""
+        with self._lock:
+            self._close()
+            self._connect()
+            return self._backend
+
+    def close(self):
+        """Release the connections held by the backend"""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._backend is not None:
+            try:
+                self._backend.close()
+            except Exception as e:
+                logger.warning(f"Error closing vector backend: {e}")
+        self._backend = None
+
+vectorstore_manager = VectorStoreManager()
+
+def get_backend() -> VectorBackend:
+    """Get the shared vector backend"""
+    return vectorstore_manager.get_backend()
+
+# Split documents into overlapping chunks
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200,
+    separators=["\n\n", "\n", ". ", " ", ""]
+)
+
+def prepare_document_chunks(
+    title: str,
+    content: str,
+    url: Optional[str] = None,
+    metadata: Optional[Dict] = None,
+    document_id: Optional[str] = None
+) -> Tuple[str, List[Document], List[str]]:
+    """Split a document into chunks and return (document_id, chunks, chunk_ids)"""
+    # Generate a document ID unless the caller fixed one (keeps chunk ids stable across retries)
+    doc_id = document_id or str(uuid.uuid4())
+
+    # Create metadata
+    meta = {
+        "document_id": doc_id,
+        "title": title,
+        "url": url,
+        "timestamp": time.time()
+    }
+
+    # Add custom metadata if provided
+    if metadata:
+        meta.update(metadata)
+
+    # Create Langchain document and split into chunks
+    doc = Document(page_content=content, metadata=meta)
+    chunks = text_splitter.split_documents([doc])
+
+    # Generate IDs for chunks
+    ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
+
+    return doc_id, chunks, ids
 
 def ingest_document(title: str, content: str, url: Optional[str] = None, metadata: Optional[Dict] = None):
     """Ingest a document into the vector store"""
     start_time = time.time()
 
     try:
-        # Generate a document ID
-        doc_id = str(uuid.uuid4())
-
-        # Create metadata
-        meta = {
-            "document_id": doc_id,
-            "title": title,
-            "url": url,
-            "timestamp": time.time()
-        }
-
-        # Add custom metadata if provided
-        if metadata:
-            meta.update(metadata)
-
-        # Split the document into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-
-        # Create Langchain document
-        doc = Document(page_content=content, metadata=meta)
-
-        # Split into chunks
-        chunks = text_splitter.split_documents([doc])
+        doc_id, chunks, ids = prepare_document_chunks(title, content, url, metadata)
         logger.info(f"Split document into {len(chunks)} chunks")
 
-        # Generate IDs for chunks
-        ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
-
-        # Create Langchain Pinecone vectorstore and add documents
+        # Add documents to the shared vector backend
         try:
-            # Get a fresh vectorstore
-            vectorstore = get_vectorstore()
+            backend = get_backend()
 
-            # Add documents to the vectorstore
-            logger.info(f"Adding {len(chunks)} document chunks to Pinecone index")
-            vectorstore.add_documents(chunks, ids=ids)
-            logger.info("Successfully added documents to Pinecone index")
+            logger.info(f"Adding {len(chunks)} document chunks to {backend.name} index")
+            backend.add_documents(chunks, ids=ids)
+            logger.info(f"Successfully added documents to {backend.name} index")
         except Exception as e:
             logger.error(f"Error adding documents to vectorstore: {e}")
             raise
@@ -197,46 +179,40 @@ def ingest_document(title: str, content: str, url: Optional[str] = None, metadat
         logger.error(f"Error ingesting document: {e}")
         raise
 
+def _format_results(docs: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+    """Drop matches below the similarity threshold and convert the rest to result dicts"""
+    results = []
+    for doc, similarity in docs:
+        if similarity < settings.SIMILARITY_THRESHOLD:
+            continue
+
+        results.append({
+            "title": doc.metadata.get("title", "Untitled"),
+            "url": doc.metadata.get("url"),
+            "content": doc.page_content,
+            "content_snippet": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
+            "relevance_score": similarity,
+            "metadata": doc.metadata
+        })
+    return results
+
 def retrieve_relevant_documents(query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None):
     """Retrieve relevant documents from the vector store"""
     start_time = time.time()
 
     try:
-        # Get vectorstore
-        vectorstore = get_vectorstore()
+        backend = get_backend()
 
-        # Prepare filter dict for Pinecone if provided
-        filter_dict = None
         if filter:
-            filter_dict = {}
-            for key, value in filter.items():
-                filter_dict[f"metadata.{key}"] = value
-            logger.info(f"Using filter: {filter_dict}")
+            logger.info(f"Using filter: {filter}")
 
-        # Perform similarity search
-        docs = vectorstore.similarity_search_with_score(
+        # Perform similarity search; backends return similarity scores
+        docs = backend.similarity_search_with_score(
             query=query,
             k=k,
-            filter=filter_dict
+            filter=filter
         )
-
-        # Format results
-        results = []
-        for doc, score in docs:
-            # Convert score to a similarity score (Pinecone returns distance)
-            similarity = 1 - score  # Convert distance to similarity
-
-            if similarity < settings.SIMILARITY_THRESHOLD:
-                continue
-
-            results.append({
-                "title": doc.metadata.get("title", "Untitled"),
-                "url": doc.metadata.get("url"),
-                "content": doc.page_content,
-                "content_snippet": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
-                "relevance_score": similarity,
-                "metadata": doc.metadata
-            })
+        results = _format_results(docs)
 
         processing_time = (time.time() - start_time) * 1000  # in milliseconds
         logger.info(f"Retrieved {len(results)} documents in {processing_time:.2f}ms for query: {query[:50]}...")
@@ -245,3 +221,60 @@ def retrieve_relevant_documents(query: str, k: int = 5, filter: Optional[Dict[st
     except Exception as e:
         logger.error(f"Error retrieving documents: {e}")
         return []
+
+@coalesce("retrieval")
+async def aretrieve_relevant_documents(query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None):
+    """Retrieve relevant documents off the event loop; identical concurrent searches run once"""
+    return await run_blocking(retrieve_relevant_documents, query=query, k=k, filter=filter)
+
+class SearchSpec(NamedTuple):
+    """One filtered search to run against a shared query embedding"""
+    k: int
+    filter: Optional[Dict[str, Any]] = None
+    name: str = "retrieval"  # stage name in metrics
+
+def _search_by_vector(embedding: List[float], search: SearchSpec) -> List[Dict[str, Any]]:
+    try:
+        docs = get_backend().similarity_search_by_vector_with_score(embedding, k=search.k, filter=search.filter)
+        return _format_results(docs)
+    except Exception as e:
+        logger.error(f"Error retrieving documents with filter {search.filter}: {e}")
+        return []
+
+@coalesce("multi_source_retrieval")
+async def retrieve_multi_source(query: str, searches: List[SearchSpec], limit: int) -> List[Dict[str, Any]]:
+    """Embed the query once, run every search concurrently, then merge and dedupe in priority order"""
+    start_time = time.time()
+
+    try:
+        with stage("query_embedding"):
+            embedding = await run_blocking(get_embedding_model().embed_query, query)
+    except Exception as e:
+        logger.error(f"Error embedding query: {e}")
+        return []
+
+    async def timed_search(search: SearchSpec) -> List[Dict[str, Any]]:
+        with stage(search.name):
+            return await run_blocking(_search_by_vector, embedding, search)
+
+    per_search = await asyncio.gather(*[timed_search(search) for search in searches])
+
+    # Earlier searches win; the same chunk returned by several searches is kept once
+    results = []
+    seen = set()
+    for docs in per_search:
+        for doc in docs:
+            key = (doc["metadata"].get("document_id"), doc["content"])
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(doc)
+            if len(results) >= limit:
+                break
+        if len(results) >= limit:
+            break
+
+    processing_time = (time.time() - start_time) * 1000  # in milliseconds
+    logger.info(f"Retrieved {len(results)} documents from {len(searches)} searches in {processing_time:.2f}ms for query: {query[:50]}...")
+
+    return results
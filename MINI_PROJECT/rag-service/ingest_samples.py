@@ -1,5 +1,4 @@
 import json
-import time
 import os
 
 
@@ -40,74 +39,67 @@ def ingest_sample_data():
     rag_service_url = os.getenv("RAG_SERVICE_URL", "http://localhost:8002")
     print(f"Using RAG service URL: {rag_service_url}")
 
-    # Ingest each resource
-    for i, resource in enumerate(resources):
-        print(f"Ingesting resource {i+1}/{len(resources)}: {resource['title']}")
-
-        try:
-            # Send ingestion request
-            print(f"  Sending request to {rag_service_url}/ingest")
-            response = requests.post(
-                f"{rag_service_url}/ingest",
-                json={
-                    "title": resource["title"],
-                    "content": resource["content"],
-                    "url": resource.get("url"),
-                    "metadata": resource.get("metadata", {})
-                },
-                timeout=60  # Increase timeout to 60 seconds for the first request
-            )
-
-            # Check response
-            if response.status_code == 200:
-                result = response.json()
-                print(f"  Success! Document ID: {result['document_id']}")
-            else:
-                print(f"  Error: {response.status_code} - {response.text}")
-
-            # Sleep to avoid overwhelming the service
-            time.sleep(1)
-
-        except requests.exceptions.ConnectionError:
-            print(f"  Error: Could not connect to the RAG service at {rag_service_url}")
-            print("  Make sure the service is running and accessible.")
-            print("  If running locally, ensure the service is started with 'docker-compose up'")
-            print("  If running in Docker, make sure the service name is correct in the URL")
-            # Exit after the first connection error to avoid repeated failures
-            break
-        except requests.exceptions.HTTPError as e:
-            if "500 Server Error" in str(e):
-                error_text = str(e.response.text) if hasattr(e, 'response') and hasattr(e.response, 'text') else ""
-
-                if "No active indexes found" in error_text:
-                    print(f"  Error: No active indexes found in your Pinecone project.")
-                    print("  The service will attempt to create an index automatically.")
-                    print("  If this error persists, check your Pinecone account:")
-                    print("  1. Make sure you have permission to create indexes")
-                    print("  2. You may need to upgrade your Pinecone plan if you've reached the index limit")
-                    print("  3. Verify your API key has write permissions")
-                    # Continue with the next resource to see if the index gets created
-                    continue
-                else:
-                    print(f"  Error: The RAG service encountered a server error.")
-                    print("  This might be due to incorrect Pinecone configuration.")
-                    print("  Check your .env file and make sure PINECONE_ENVIRONMENT is a valid environment like 'gcp-starter'.")
-                    print("  You can find your environment in the Pinecone console: https://app.pinecone.io/")
-                    print(f"  Error details: {error_text}")
-                    # Exit after the first server error to avoid repeated failures
-                    break
-            else:
-                print(f"  Error: {e}")
+    # Stream every resource to the bulk endpoint as NDJSON in a single request
+    def ndjson_lines():
+        for resource in resources:
+            yield (json.dumps({
+                "title": resource["title"],
+                "content": resource["content"],
+                "url": resource.get("url"),
+                "metadata": resource.get("metadata", {})
+            }) + "\n").encode("utf-8")
+
+    try:
+        print(f"  Sending {len(resources)} resources to {rag_service_url}/ingest/bulk")
+        response = requests.post(
+            f"{rag_service_url}/ingest/bulk",
+            data=ndjson_lines(),
+            headers={"Content-Type": "application/x-ndjson"},
+            stream=True,
+            timeout=60  # Increase timeout to 60 seconds for the first request
+        )
+        response.raise_for_status()
+
+        # Results stream back one line per document as soon as it is stored
+        for line in response.iter_lines():
+            if not line:
                 continue
-        except requests.exceptions.Timeout:
-            print(f"  Error: Request to {rag_service_url} timed out after 60 seconds")
-            print("  The service might be downloading the embedding model for the first time,")
-            print("  which can take several minutes. Subsequent requests should be faster.")
-            print("  You can check the logs with: docker-compose logs rag-service")
-            # Continue with the next resource
-            continue
-        except Exception as e:
-            print(f"  Error: {e}")
+            result = json.loads(line)
+            if result.get("type") == "summary":
+                print(f"Ingested {result['documents'] - result['failed']}/{result['documents']} resources "
+                      f"({result['chunks']} chunks) in {result['processing_time_ms']:.0f}ms")
+            elif result.get("status") == "success":
+                print(f"  Success! {result['title']} -> Document ID: {result['document_id']}")
+            else:
+                print(f"  Error on line {result.get('line')}: {result.get('error')}")
+
+    except requests.exceptions.ConnectionError:
+        print(f"  Error: Could not connect to the RAG service at {rag_service_url}")
+        print("  Make sure the service is running and accessible.")
+        print("  If running locally, ensure the service is started with 'docker-compose up'")
+        print("  If running in Docker, make sure the service name is correct in the URL")
+    except requests.exceptions.HTTPError as e:
+        error_text = str(e.response.text) if hasattr(e, 'response') and hasattr(e.response, 'text') else ""
+
+        if "No active indexes found" in error_text:
+            print(f"  Error: No active indexes found in your Pinecone project.")
+            print("  If this error persists, check your Pinecone account:")
+            print("  1. Make sure you have permission to create indexes")
+            print("  2. You may need to upgrade your Pinecone plan if you've reached the index limit")
+            print("  3. Verify your API key has write permissions")
+        else:
+            print(f"  Error: The RAG service encountered a server error.")
+            print("  This might be due to incorrect Pinecone configuration.")
+            print("  Check your .env file and make sure PINECONE_ENVIRONMENT is a valid environment like 'gcp-starter'.")
+            print("  You can find your environment in the Pinecone console: https://app.pinecone.io/")
+            print(f"  Error details: {error_text}")
+    except requests.exceptions.Timeout:
+        print(f"  Error: Request to {rag_service_url} timed out after 60 seconds")
+        print("  The service might be downloading the embedding model for the first time,")
+        print("  which can take several minutes. Subsequent requests should be faster.")
+        print("  You can check the logs with: docker-compose logs rag-service")
+    except Exception as e:
+        print(f"  Error: {e}")
 
     print("Ingestion complete!")
 
@@ -0,0 +1,5 @@
+import os
+
+# Tests never reach external services: local index, fake embeddings, simulated LLM
+os.environ.setdefault("SIMULATED_MODE", "true")
+os.environ.setdefault("LOCAL_INDEX_PATH", "")
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.bulk_ingest import BulkIngestion, start_bulk_ingest, _read_lines
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def run_lines(lines):
+    async def run():
+        ingestion = BulkIngestion(batch_size=2)
+        await ingestion.run(chunks(*lines))
+        results = []
+        while True:
+            result = ingestion.results.get_nowait()
+            if result is None:
+                return ingestion, results
+            results.append(result)
+    return asyncio.run(run())
+
+
+def test_read_lines_splits_across_chunks():
+    lines = asyncio.run(collect(_read_lines(chunks(b'{"a"', b': 1}\n{"b": 2}\n', b'{"c": 3}'))))
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_each_line_gets_a_result():
+    document = json.dumps({"title": "Breathing", "content": "Slow breathing calms the body."}).encode()
+    ingestion, results = run_lines([document, b"", b"not json", document])
+
+    by_line = {result["line"]: result for result in results}
+    assert sorted(by_line) == [1, 3, 4]
+    assert by_line[1]["status"] == "success" and by_line[1]["chunk_count"] == 1
+    assert by_line[3]["status"] == "error"
+    assert (ingestion.documents, ingestion.failed) == (3, 1)
+
+
+@pytest.mark.parametrize("line", [b"[1]", b'"x"', b"3", b"null"])
+def test_non_object_lines_fail_on_their_own(line):
+    ingestion, results = run_lines([line])
+    assert results == [{"type": "document", "line": 1, "status": "error", "error": results[0]["error"]}]
+    assert "JSON object" in results[0]["error"]
+    assert ingestion.failed == 1
+
+
+def test_missing_fields_fail_on_their_own():
+    ingestion, results = run_lines([b'{"title": "No content"}'])
+    assert results[0]["status"] == "error"
+    assert ingestion.failed == 1
+
+
+async def call(app, body_parts, spec_version):
+    """Drive one POST /ingest/bulk through the ASGI interface, like a server speaking ``spec_version``"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/ingest/bulk",
+        "raw_path": b"/ingest/bulk",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/x-ndjson")],
+        "client": ("test", 1234),
+        "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": part, "more_body": True} for part in body_parts]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    finished = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if messages:
+            await asyncio.sleep(0)  # let any other reader race for the message
+            return messages.pop(0)
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            finished.set()
+
+    await asyncio.wait_for(app(scope, receive, send), timeout=10)
+    body = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+def bulk_app():
+    # Same wiring as the /ingest/bulk endpoint in app.main
+    app = FastAPI()
+
+    @app.post("/ingest/bulk")
+    async def ingest_bulk(request: Request):
+        return StreamingResponse(await start_bulk_ingest(request.stream()), media_type="application/x-ndjson")
+
+    return app
+
+
+def body_parts(count):
+    lines = [json.dumps({"title": f"Doc {i}", "content": f"Content of document {i}."}) + "\n" for i in range(count)]
+    return [line.encode() for line in lines]
+
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_endpoint_reads_whole_body(spec_version):
+    results = asyncio.run(call(bulk_app(), body_parts(5), spec_version))
+
+    assert [result["line"] for result in results if result["type"] == "document"] == [1, 2, 3, 4, 5]
+    assert results[-1]["type"] == "summary"
+    assert (results[-1]["documents"], results[-1]["failed"]) == (5, 0)
+
+
+def test_app_endpoint_under_spec_2_3():
+    pytest.importorskip("google.generativeai")
+    from app.main import app
+
+    results = asyncio.run(call(app, body_parts(3), "2.3"))
+    assert results[-1]["type"] == "summary"
+    assert results[-1]["documents"] == 3
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.conversations import ConversationStore, MemoryConversationBackend
+
+
+def test_exchange_is_stored_before_summarizing():
+    async def scenario():
+        store = ConversationStore(max_turns=2)
+        store._backend = MemoryConversationBackend(10)
+        release = asyncio.Event()
+
+        async def summarize(summary, turns):
+            await release.wait()
+            return "summary of " + " ".join(turn["content"] for turn in turns)
+
+        store._summarize = summarize
+        store.record_turn("c1", "hi", "hello")
+        store.record_turn("c1", "how are you", "fine")
+        await asyncio.sleep(0.01)
+
+        # The first exchange is still being summarized; the second is already visible
+        during = await store.load("c1")
+        release.set()
+        await asyncio.gather(*store._tasks)
+        return during, await store.load("c1")
+
+    during, after = asyncio.run(scenario())
+    assert during.summary == ""
+    assert [turn["content"] for turn in during.turns] == ["hi", "hello", "how are you", "fine"]
+    assert after.summary == "summary of hi hello"
+    assert [turn["content"] for turn in after.turns] == ["how are you", "fine"]
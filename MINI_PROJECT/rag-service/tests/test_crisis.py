@@ -0,0 +1,47 @@
+import pytest
+
+from app.crisis import detect_crisis
+
+
+@pytest.mark.parametrize("text", [
+    "I want to die",
+    "i really just want to die.",
+    "Is it normal that I wanna die?",
+    "I want to kill myself",
+    "I'm going to kill myself tonight",
+    "im gonna end it all",
+    "I've been thinking about ending my life",
+    "I keep thinking about suicide",
+    "I'm suicidal",
+    "I feel suicidal again",
+    "I have a plan to kill myself",
+    "I've written a suicide note",
+    "I've been self-harming",
+    "I don't want to live anymore",
+    "I don’t want to be alive",
+    "I can't take it anymore",
+    "There's no reason to live.",
+    "Everyone would be better off without me",
+    "I'm not going to school, I want to die",
+])
+def test_detects_first_person_crisis_language(text):
+    assert detect_crisis(text)
+
+
+@pytest.mark.parametrize("text", [
+    "I don't want to die, how can I be healthier?",
+    "I'm not suicidal, just tired",
+    "I would never hurt myself",
+    "I'm not going to kill myself, don't worry",
+    "What are the warning signs of suicide?",
+    "How can I help a friend who is suicidal?",
+    "Is self-harm common among teenagers?",
+    "My character wants to die in the story",
+    "I want to diet before summer",
+    "I hurt myself playing football",
+    "There's no reason to live in fear",
+    "I can't go on the trip this weekend",
+    "I'm thinking about dyeing my hair",
+])
+def test_ignores_negations_and_informational_questions(text):
+    assert not detect_crisis(text)
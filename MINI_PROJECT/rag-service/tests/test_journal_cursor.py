@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pytest
+
+from app.journal_store import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 8, 30, 15, 123000)
+    cursor = encode_cursor({"created_at": created_at, "id": "entry-1"})
+
+    assert decode_cursor(cursor) == (created_at, "entry-1")
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor({"created_at": datetime(2024, 3, 1), "id": "a/b+c,d?"})
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    # Only the first comma separates the timestamp from the id
+    assert decode_cursor(cursor) == (datetime(2024, 3, 1), "a/b+c,d?")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "!!!", encode_cursor({"created_at": datetime(2024, 1, 1), "id": ""})[:4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
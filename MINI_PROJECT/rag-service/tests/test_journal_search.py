@@ -0,0 +1,63 @@
+import math
+from collections import Counter
+
+from app.journal_search import BM25Index, entry_terms, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Felt ANXIOUS, then calm-ish.") == ["felt", "anxious", "then", "calm", "ish"]
+
+
+def test_entry_terms_weight_title_and_tags():
+    terms = entry_terms({"title": "Calm morning", "content": "calm walk", "tags": ["Walk"]})
+    assert terms == Counter({"calm": 3, "morning": 2, "walk": 3})
+
+
+def test_bm25_score_matches_formula():
+    index = BM25Index(k1=1.2, b=0.75)
+    index.add("a", Counter({"anxiety": 2, "work": 1}))
+    index.add("b", Counter({"sleep": 1}))
+
+    (entry_id, score), = index.search("anxiety", 5)
+    idf = math.log(1 + (2 - 1 + 0.5) / (1 + 0.5))
+    norm = 1.2 * (1 - 0.75 + 0.75 * 3 / 2)
+    assert entry_id == "a"
+    assert math.isclose(score, idf * 2 * 2.2 / (2 + norm))
+
+
+def test_bm25_ranks_by_frequency_and_rarity():
+    index = BM25Index()
+    index.add("often", Counter({"panic": 3, "day": 3}))
+    index.add("once", Counter({"panic": 1, "day": 5}))
+    index.add("other", Counter({"day": 6}))
+
+    assert [entry_id for entry_id, _ in index.search("panic day", 5)] == ["often", "once", "other"]
+    assert index.search("unknown", 5) == []
+
+
+def test_bm25_replace_and_remove():
+    index = BM25Index()
+    index.add("a", Counter({"old": 1}))
+    index.add("a", Counter({"new": 1}))
+
+    assert index.search("old", 5) == []
+    assert [entry_id for entry_id, _ in index.search("new", 5)] == ["a"]
+
+    index.remove("a")
+    index.remove("missing")
+    assert len(index) == 0
+    assert index.search("new", 5) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]], k=60)
+
+    # Ids found by both lists beat the top hit of a single list
+    assert fused == ["c", "b", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_scores():
+    fused = reciprocal_rank_fusion([["x", "y"], ["y"]], k=1)
+    # x: 1/2; y: 1/3 + 1/2
+    assert fused == ["y", "x"]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.backends.local import LocalVectorBackend
+
+DIMENSION = 3
+
+
+def add(index, ids, metadatas=None):
+    vectors = np.eye(DIMENSION)[[i % DIMENSION for i in range(len(ids))]].tolist()
+    index.add_embeddings([f"doc {doc_id}" for doc_id in ids], vectors, metadatas or [{} for _ in ids], ids)
+
+
+def search(index, filter=None):
+    hits = index.similarity_search_by_vector_with_score([1.0] * DIMENSION, k=10, filter=filter)
+    return sorted(doc.page_content for doc, _ in hits)
+
+
+def test_upsert_overwrites_in_place():
+    index = LocalVectorBackend(None, DIMENSION, initial_capacity=1)
+    add(index, ["a", "b"])
+    add(index, ["a"], [{"kind": "new"}])
+
+    assert len(index) == 2
+    assert search(index, {"kind": "new"}) == ["doc a"]
+
+
+def test_delete_moves_last_row_and_keeps_filters():
+    index = LocalVectorBackend(None, DIMENSION)
+    add(index, ["a", "b", "c"], [{"user": "u1"}, {"user": "u2"}, {"user": "u1"}])
+    index.delete(["a", "missing"])
+
+    assert len(index) == 2
+    assert search(index) == ["doc b", "doc c"]
+    assert search(index, {"user": "u1"}) == ["doc c"]
+
+    index.delete(["c"])
+    add(index, ["d"], [{"user": "u1"}])
+    assert search(index, {"user": "u1"}) == ["doc d"]
+    assert search(index) == ["doc b", "doc d"]
@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+
+from app.backends.segments import SegmentedVectorBackend, Segment, MANIFEST_FILE
+
+DIMENSION = 4
+
+
+def open_index(directory, **kwargs):
+    return SegmentedVectorBackend(None, DIMENSION, str(directory), **kwargs)
+
+
+def add(index, ids, text="doc"):
+    vectors = np.eye(DIMENSION)[[ord(doc_id[-1]) % DIMENSION for doc_id in ids]].tolist()
+    index.add_embeddings([f"{text} {doc_id}" for doc_id in ids], vectors, [{"id": doc_id} for doc_id in ids], ids)
+
+
+def texts(index):
+    hits = index.similarity_search_by_vector_with_score([1.0] * DIMENSION, k=100)
+    return sorted(doc.page_content for doc, _ in hits)
+
+
+def segment_names(index):
+    return [segment.name for segment in index._segments]
+
+
+def test_newer_rows_shadow_older_ones(tmp_path):
+    index = open_index(tmp_path)
+    add(index, ["a", "b"], text="old")
+    add(index, ["a"], text="new")
+    add(index, ["c", "c"], text="dup")
+
+    assert len(index) == 3
+    assert texts(index) == ["dup c", "new a", "old b"]
+    assert texts(open_index(tmp_path)) == ["dup c", "new a", "old b"]
+
+
+def test_search_ranks_live_rows_with_and_without_filter(tmp_path):
+    index = open_index(tmp_path)
+    add(index, ["a", "b"], text="old")
+    add(index, ["a"], text="new")
+    query = np.eye(DIMENSION)[ord("a") % DIMENSION].tolist()
+
+    [(doc, score)] = index.similarity_search_by_vector_with_score(query, k=1)
+    assert (doc.page_content, score) == ("new a", 1.0)
+    [(doc, _)] = index.similarity_search_by_vector_with_score(query, k=1, filter={"id": "a"})
+    assert doc.page_content == "new a"
+
+    index.delete(["a"])
+    assert [doc.page_content for doc, _ in index.similarity_search_by_vector_with_score(query, k=5)] == ["old b"]
+    assert index.similarity_search_by_vector_with_score(query, k=5, filter={"id": "a"}) == []
+
+
+def test_other_process_sees_writes(tmp_path):
+    writer = open_index(tmp_path)
+    reader = open_index(tmp_path)
+    add(writer, ["a"], text="old")
+    assert texts(reader) == ["old a"]
+
+    add(writer, ["a"], text="new")
+    assert texts(reader) == ["new a"]
+    assert len(reader) == 1
+
+
+def test_merge_picks_smallest_adjacent_run(tmp_path):
+    index = open_index(tmp_path, max_segments=3, merge_factor=2)
+    add(index, [f"big{i}" for i in range(10)])
+    index.close()
+    big = segment_names(index)[0]
+
+    for i in range(4):
+        add(index, [f"small{i}"])
+        index.close()
+
+    names = segment_names(index)
+    assert len(names) <= 3
+    # The large first segment is never rewritten while smaller runs are available
+    assert names[0] == big
+    assert len(index) == 14
+
+
+def test_merge_keeps_newest_rows(tmp_path):
+    index = open_index(tmp_path, max_segments=2, merge_factor=2)
+    add(index, ["a", "b"], text="old")
+    add(index, ["a"], text="new")
+    add(index, ["b"], text="new")
+    index.close()
+
+    assert len(index._segments) <= 2
+    assert texts(index) == ["new a", "new b"]
+    assert texts(open_index(tmp_path)) == ["new a", "new b"]
+
+
+def test_open_removes_orphaned_segment_files(tmp_path):
+    index = open_index(tmp_path)
+    add(index, ["a"])
+
+    orphan = Segment.write(str(tmp_path), np.zeros((1, DIMENSION), dtype=np.float32), ["x"], ["x"], [{}])
+    open(os.path.join(tmp_path, "seg-crashed.npy.tmp"), "wb").close()
+
+    reopened = open_index(tmp_path)
+    files = os.listdir(tmp_path)
+    assert not any(name.startswith(orphan) or name.endswith(".tmp") for name in files)
+    assert Segment.vectors_path(str(tmp_path), segment_names(index)[0]).split(os.sep)[-1] in files
+    assert MANIFEST_FILE in files
+    assert texts(reopened) == ["doc a"]
+
+
+def test_delete_hides_rows_and_survives_reopen(tmp_path):
+    index = open_index(tmp_path)
+    add(index, ["a", "b", "c"])
+    index.delete(["b", "missing"])
+
+    assert len(index) == 2
+    assert texts(index) == ["doc a", "doc c"]
+    assert texts(open_index(tmp_path)) == ["doc a", "doc c"]
+
+    add(index, ["b"], text="new")
+    assert texts(index) == ["doc a", "doc c", "new b"]
+
+
+def test_merge_keeps_tombstones_while_older_segments_remain(tmp_path):
+    index = open_index(tmp_path, max_segments=3, merge_factor=2)
+    add(index, [f"big{i}" for i in range(10)])
+    index.close()
+    add(index, ["x"], text="small")
+    add(index, ["y"], text="small")
+    index.delete(["big1"])
+    index.close()
+
+    # The tombstone was merged with other small segments; the first segment was not rewritten
+    assert len(index._segments) <= 3
+    assert "doc big1" not in texts(index)
+    reopened = open_index(tmp_path)
+    assert "doc big1" not in texts(reopened)
+    assert len(reopened) == 11
+
+
+def test_merge_from_the_first_segment_drops_tombstones(tmp_path):
+    index = open_index(tmp_path, max_segments=1, merge_factor=4)
+    add(index, ["a", "b"])
+    index.delete(["a"])
+    index.close()
+
+    assert len(index._segments) == 1
+    assert index._segments[0].ids == ["b"]
+    assert texts(open_index(tmp_path)) == ["doc b"]
@@ -0,0 +1,67 @@
+import asyncio
+
+from app.singleflight import SingleFlight, coalesce, flight_key
+
+
+def test_flight_key_ignores_dict_order():
+    assert flight_key("f", {"a": 1, "b": [1, 2]}) == flight_key("f", {"b": [1, 2], "a": 1})
+    assert flight_key("f", {"a": 1}) != flight_key("f", {"a": 2})
+    assert flight_key("f", {"a": 1}) != flight_key("g", {"a": 1})
+
+
+def test_positional_and_keyword_calls_share_a_key():
+    calls = []
+
+    @coalesce("test_spelling")
+    async def work(query, k=5):
+        calls.append((query, k))
+        number = len(calls)
+        await asyncio.sleep(0.01)
+        return number
+
+    async def run():
+        return await asyncio.gather(work("q"), work("q", 5), work(query="q", k=5), work("other"))
+
+    assert asyncio.run(run()) == [1, 1, 1, 2]
+    assert len(calls) == 2
+    assert work.flight.stats() == {"in_flight": 0, "executed": 2, "shared": 2}
+
+
+def test_when_false_runs_every_call():
+    calls = []
+
+    @coalesce("test_when", when=lambda arguments: arguments["conversation_id"] is not None)
+    async def chat(message, conversation_id=None):
+        calls.append(conversation_id)
+        number = len(calls)
+        await asyncio.sleep(0.01)
+        return number
+
+    async def run():
+        anonymous = await asyncio.gather(chat("hi"), chat("hi"))
+        known = await asyncio.gather(chat("hi", "c1"), chat("hi", conversation_id="c1"))
+        return anonymous, known
+
+    anonymous, known = asyncio.run(run())
+    assert sorted(anonymous) == [1, 2]
+    assert known == [3, 3]
+    assert chat.flight.executed == 1
+
+
+def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight("test_errors")
+    attempts = []
+
+    async def fail():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        first = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        second = await asyncio.gather(flight.do("k", fail), return_exceptions=True)
+        return first + second
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(attempts) == 2
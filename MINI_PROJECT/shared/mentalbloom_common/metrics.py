@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Iterator
+
+# Latency buckets in seconds, from sub-millisecond local work to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings of the request being handled, for its Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative latency histogram with one label, exported in Prometheus text format"""
+
+    def __init__(self, name: str, description: str, label: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, List[float]] = {}  # label value -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {counts[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_DURATION = Histogram("stage_duration_seconds", "Time spent in each processing stage", "stage")
+REQUEST_DURATION = Histogram("request_duration_seconds", "Time to handle each request, by endpoint", "endpoint")
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and in the current request's Server-Timing"""
+    STAGE_DURATION.observe(name, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as a named stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def render_metrics() -> str:
+    """All histograms in the Prometheus text exposition format"""
+    return "\n".join(STAGE_DURATION.render() + REQUEST_DURATION.render()) + "\n"
+
+
+class MetricsMiddleware:
+    """Times every request and adds a Server-Timing header with the stages it went through
+
+    Stages that finish after the response headers are sent (e.g. while streaming) still reach
+    the histograms but not the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+                entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            endpoint = scope.get("endpoint")
+            REQUEST_DURATION.observe(getattr(endpoint, "__name__", "unmatched"), time.perf_counter() - start)